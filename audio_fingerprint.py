@@ -0,0 +1,308 @@
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+from silence_trimming import decode_audio_blocks
+
+# Author: James (Jimmy) Allah-Mensah
+# Version: Python 3.7
+
+SAMPLE_RATE = 8000
+WINDOW_LENGTH = 512
+HOP_LENGTH = 256
+FRAME_SECONDS = HOP_LENGTH / SAMPLE_RATE
+FRAMES_PER_CHUNK = 20000
+# Spectrum bins (15.6 Hz each) bounding the bands a peak is picked from, from 156 Hz to 4 kHz
+BAND_EDGES = [10, 20, 40, 80, 160, 257]
+# A peak is the loudest band value within this many frames on each side
+PEAK_NEIGHBORHOOD = 2
+# Each peak is paired with the peaks of the next MAX_PAIR_FRAMES frames, at most FAN_OUT of them
+FAN_OUT = 5
+MAX_PAIR_FRAMES = 63
+# A recording matches when at least MIN_MATCHES hashes, and MIN_MATCH_RATIO of the new file's hashes, agree on the
+# same time offset
+MIN_MATCHES = 20
+MIN_MATCH_RATIO = 0.05
+# Stored as the index's user_version, an index of hashes computed differently is cleared
+HASH_VERSION = 2
+
+
+def spectrum_bands(samples):
+    '''
+    Finds the loudest bin of every band of every whole frame of the samples
+    :param samples: Decoded samples at SAMPLE_RATE
+    :return: (bin, log magnitude) arrays, one row per frame and one column per band
+    '''
+    num_frames = max(0, (len(samples) - WINDOW_LENGTH) // HOP_LENGTH + 1)
+    window = np.hanning(WINDOW_LENGTH)
+    band_bins = np.empty((num_frames, len(BAND_EDGES) - 1), dtype=np.int64)
+    band_levels = np.empty((num_frames, len(BAND_EDGES) - 1))
+    offsets = np.arange(WINDOW_LENGTH)
+    for start in range(0, num_frames, FRAMES_PER_CHUNK):
+        frame_starts = np.arange(start, min(num_frames, start + FRAMES_PER_CHUNK)) * HOP_LENGTH
+        frames = samples[frame_starts[:, None] + offsets].astype(np.float64) / 32768.0
+        spectrum = np.log(np.abs(np.fft.rfft(frames * window, axis=1)) + 1e-6)
+        for band, (low, high) in enumerate(zip(BAND_EDGES[:-1], BAND_EDGES[1:])):
+            bins = np.argmax(spectrum[:, low:high], axis=1)
+            band_bins[start:start + len(frames), band] = bins + low
+            band_levels[start:start + len(frames), band] = spectrum[np.arange(len(frames)), bins + low]
+    return band_bins, band_levels
+
+
+def band_features(blocks):
+    '''
+    Computes the band bins and levels of a recording block by block, as it is decoded. Frames overlap, so the samples
+    from the first frame not yet computed on are carried over to the next block
+    :param blocks: Sample blocks at SAMPLE_RATE, see decode_audio_blocks
+    :return: (bins, levels, number of samples), see spectrum_bands
+    '''
+    all_bins = []
+    all_levels = []
+    num_samples = 0
+    leftover = np.zeros(0, dtype=np.int16)
+    for block in blocks:
+        num_samples += len(block)
+        samples = np.concatenate((leftover, block))
+        band_bins, band_levels = spectrum_bands(samples)
+        all_bins.append(band_bins)
+        all_levels.append(band_levels)
+        leftover = samples[len(band_bins) * HOP_LENGTH:]
+    if len(all_bins) == 0:
+        return np.zeros((0, len(BAND_EDGES) - 1), dtype=np.int64), np.zeros((0, len(BAND_EDGES) - 1)), 0
+    return np.concatenate(all_bins), np.concatenate(all_levels), num_samples
+
+
+def band_peaks(band_bins, band_levels):
+    '''
+    Picks the spectral peaks of the audio: the loudest bin of every band of every frame, kept if it is also louder
+    than the same band in the neighbouring frames and than the recording's median band level
+    :param band_bins: Loudest bin of every band of every frame, see band_features
+    :param band_levels: Level of those bins
+    :return: (frame, bin) arrays of the peaks, sorted by frame
+    '''
+    if len(band_bins) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    neighborhood_max = band_levels.copy()
+    for shift in range(1, PEAK_NEIGHBORHOOD + 1):
+        neighborhood_max[shift:] = np.maximum(neighborhood_max[shift:], band_levels[:-shift])
+        neighborhood_max[:-shift] = np.maximum(neighborhood_max[:-shift], band_levels[shift:])
+    is_peak = (band_levels >= neighborhood_max) & (band_levels > np.median(band_levels, axis=0))
+    frames, bands = np.nonzero(is_peak)
+    return frames, band_bins[frames, bands]
+
+
+def peak_hashes(frames, bins):
+    '''
+    Pairs every peak with the next peaks and hashes each pair by its two bins and their distance in frames (24 bits),
+    so the hash does not depend on where the pair occurs in the recording
+    :return: (hashes, anchor frames) arrays
+    '''
+    hashes = []
+    anchors = []
+    for shift in range(1, FAN_OUT + len(BAND_EDGES)):
+        if shift >= len(frames):
+            break
+        distance = frames[shift:] - frames[:-shift]
+        valid = (distance > 0) & (distance <= MAX_PAIR_FRAMES)
+        hashes.append((bins[:-shift] << 15 | bins[shift:] << 6 | distance)[valid])
+        anchors.append(frames[:-shift][valid])
+    if len(hashes) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(hashes), np.concatenate(anchors)
+
+
+def fingerprint_file(file_name):
+    '''
+    Computes the fingerprint of the audio track of a media file
+    :param file_name: Audio or video file
+    :return: Dictionary with the hashes, the frame of each hash and the duration in seconds
+    '''
+    band_bins, band_levels, num_samples = band_features(decode_audio_blocks(file_name, SAMPLE_RATE))
+    hashes, anchors = peak_hashes(*band_peaks(band_bins, band_levels))
+    return {'hashes': hashes, 'frames': anchors, 'duration': num_samples / SAMPLE_RATE}
+
+
+class FingerprintIndex:
+    '''
+    Local index of the fingerprints of every transcribed recording, with a copy of its transcription. Hashes are kept
+    in an SQLite table indexed by hash, so a new file is matched with one indexed join however many recordings there
+    are
+    '''
+
+    def __init__(self, directory):
+        '''
+        :param directory: Directory the index database and transcriptions are kept in
+        '''
+        self.directory = directory
+        os.makedirs(os.path.join(directory, 'transcriptions'), exist_ok=True)
+        # The watch folder daemon's workers each open the index, SQLite serializes the writers
+        self.connection = sqlite3.connect(os.path.join(directory, 'fingerprints.sqlite'), timeout=60)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS recordings (id INTEGER PRIMARY KEY, file_name TEXT, job_name TEXT,
+                                                   duration REAL, added REAL);
+            CREATE TABLE IF NOT EXISTS hashes (hash INTEGER, recording INTEGER, frame INTEGER);
+            CREATE INDEX IF NOT EXISTS hashes_by_hash ON hashes (hash);
+        ''')
+        if self.connection.execute('PRAGMA user_version').fetchone()[0] != HASH_VERSION:
+            with self.connection:
+                self.connection.execute('DELETE FROM hashes')
+                self.connection.execute('DELETE FROM recordings')
+            self.connection.execute('PRAGMA user_version = {}'.format(HASH_VERSION))
+
+    def transcription_path(self, recording):
+        return os.path.join(self.directory, 'transcriptions', '{}.json'.format(recording))
+
+    def add(self, file_name, fingerprint, transcription, job_name):
+        '''
+        Adds a transcribed recording to the index
+        :param fingerprint: Fingerprint returned by fingerprint_file
+        :param transcription: Parsed transcription JSON, in the times of the recording
+        :return: Id of the recording
+        '''
+        with self.connection:
+            recording = self.connection.execute(
+                'INSERT INTO recordings (file_name, job_name, duration, added) VALUES (?, ?, ?, ?)',
+                (file_name, job_name, fingerprint['duration'], time.time())).lastrowid
+            self.connection.executemany('INSERT INTO hashes VALUES (?, ?, ?)',
+                                        zip(fingerprint['hashes'].tolist(), [recording] * len(fingerprint['hashes']),
+                                            fingerprint['frames'].tolist()))
+        with open(self.transcription_path(recording), 'w') as file:
+            json.dump(transcription, file)
+        return recording
+
+    def find(self, fingerprint):
+        '''
+        Finds an indexed recording the new file is a copy, or a trimmed copy, of. Hashes of the same audio line up at
+        a single time offset, so the recording with the most hashes agreeing on one offset is the match
+        :param fingerprint: Fingerprint returned by fingerprint_file
+        :return: Dictionary with the recording id, file_name, job_name, offset (seconds into the indexed recording at
+                 which the new file starts), matches and transcription, or None if there is no match
+        '''
+        if len(fingerprint['hashes']) == 0:
+            return None
+        with self.connection:
+            self.connection.execute('CREATE TEMP TABLE IF NOT EXISTS query (hash INTEGER, frame INTEGER)')
+            self.connection.execute('DELETE FROM query')
+            self.connection.executemany('INSERT INTO query VALUES (?, ?)',
+                                        zip(fingerprint['hashes'].tolist(), fingerprint['frames'].tolist()))
+            # Hashes are short enough that every one also matches unrelated recordings, so the votes are counted in
+            # SQL and only the offsets at least two hashes agree on are returned, however large the index grows
+            rows = self.connection.execute('SELECT hashes.recording, hashes.frame - query.frame AS offset, COUNT(*) '
+                                           'FROM query JOIN hashes ON hashes.hash = query.hash '
+                                           'GROUP BY hashes.recording, offset HAVING COUNT(*) > 1 '
+                                           'ORDER BY hashes.recording, offset').fetchall()
+        if len(rows) == 0:
+            return None
+
+        rows = np.array(rows, dtype=np.int64)
+        pairs = rows[:, :2]
+        counts = rows[:, 2]
+        # Re-encoding can move a peak into the neighbouring frame, the neighbouring offsets are counted too
+        keys = pairs[:, 0] * (1 << 40) + pairs[:, 1]
+        smoothed = counts.copy()
+        for shift in (-1, 1):
+            neighbors = np.searchsorted(keys, keys + shift)
+            found = (neighbors < len(keys)) & (keys[np.minimum(neighbors, len(keys) - 1)] == keys + shift)
+            smoothed[found] += counts[neighbors[found]]
+        best = int(np.argmax(smoothed))
+        if smoothed[best] < max(MIN_MATCHES, MIN_MATCH_RATIO * len(fingerprint['hashes'])):
+            return None
+
+        recording = int(pairs[best, 0])
+        offset = float(pairs[best, 1]) * FRAME_SECONDS
+        file_name, job_name, duration = self.connection.execute(
+            'SELECT file_name, job_name, duration FROM recordings WHERE id = ?', (recording,)).fetchone()
+        # A new file running past either end of the recording has speech the stored transcription does not cover
+        if offset < -1.0 or offset + fingerprint['duration'] > duration + 1.0:
+            return None
+        if not os.path.exists(self.transcription_path(recording)):
+            return None
+        with open(self.transcription_path(recording)) as file:
+            transcription = json.load(file)
+        return {'recording': recording, 'file_name': file_name, 'job_name': job_name,
+                'offset': max(0.0, offset), 'matches': int(smoothed[best]),
+                'transcription': transcription}
+
+    def close(self):
+        self.connection.close()
+
+
+def shift_transcription(transcription, offset, duration):
+    '''
+    Cuts the part of a transcription said between offset and offset + duration, and shifts its times to start at 0,
+    for a new file that is a trimmed copy of the transcribed recording
+    :param transcription: Parsed transcription JSON
+    :param offset: Seconds into the transcribed recording at which the new file starts
+    :param duration: Length of the new file in seconds
+    :return: A new transcription JSON
+    '''
+    def shifted(value):
+        return '{:.3f}'.format(max(0.0, float(value) - offset))
+
+    def inside(item):
+        return offset - 0.5 <= float(item['start_time']) <= offset + duration
+
+    items = []
+    words = []
+    keep_punctuation = False
+    for item in transcription['results']['items']:
+        if item['type'] == 'punctuation':
+            if keep_punctuation:
+                items.append(item)
+                words[-1] += item['alternatives'][0]['content']
+            continue
+        keep_punctuation = inside(item)
+        if keep_punctuation:
+            items.append(dict(item, start_time=shifted(item['start_time']), end_time=shifted(item['end_time'])))
+            words.append(item['alternatives'][0]['content'])
+
+    segments = []
+    for segment in transcription['results'].get('speaker_labels', {}).get('segments', []):
+        segment_items = [dict(item, start_time=shifted(item['start_time']), end_time=shifted(item['end_time']))
+                         for item in segment['items'] if inside(item)]
+        if len(segment_items) > 0:
+            segments.append(dict(segment, start_time=segment_items[0]['start_time'],
+                                 end_time=segment_items[-1]['end_time'], items=segment_items))
+
+    results = dict(transcription['results'], items=items, transcripts=[{'transcript': ' '.join(words)}])
+    if 'speaker_labels' in transcription['results']:
+        results['speaker_labels'] = dict(transcription['results']['speaker_labels'], segments=segments)
+    return dict(transcription, results=results)
+
+
+def reuse_transcription(match, fingerprint):
+    '''
+    Returns the transcription of a matched recording in the times of the new file, cut to the part the new file
+    covers, since it may be trimmed at either end
+    :param match: Match returned by FingerprintIndex.find
+    :param fingerprint: Fingerprint of the new file
+    '''
+    return shift_transcription(match['transcription'], match['offset'], fingerprint['duration'])
+
+
+def main():
+    '''
+    Checks media files against the fingerprint index
+    Usage: python audio_fingerprint.py INDEX_DIRECTORY MEDIA_FILE [MEDIA_FILE ...]
+    '''
+    if len(sys.argv) < 3:
+        print(main.__doc__)
+        return
+    index = FingerprintIndex(sys.argv[1])
+    for file_name in sys.argv[2:]:
+        match = index.find(fingerprint_file(file_name))
+        if match is None:
+            print('{}: no match'.format(file_name))
+        else:
+            print('{}: copy of {} (job {}) starting at {:.1f} seconds, {} matching hashes'.format(
+                file_name, match['file_name'], match['job_name'], match['offset'], match['matches']))
+    index.close()
+
+
+if __name__ == '__main__':
+    main()
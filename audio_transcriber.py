@@ -1,24 +1,44 @@
+import copy
+import functools
 import hashlib
 import re
 import urllib
 
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 import json
 import logging
 import glob, os
 import pathlib
+import sqlite3
+import subprocess
 import googletrans
 from google_trans_new import google_translator
 import time
 from fpdf import FPDF
 from datetime import datetime
 from pytz import timezone
+from pipeline_scheduler import Pipeline, Stage
+import speaker_analytics
+from phonetic_index import PhoneticIndex, format_hit_time
+import highlight_export
+import transcript_summary
+import rate_governor
+import silence_trimming
+import streaming_transcription
+import audio_fingerprint
+from transcript_trie import TranscriptTrie
 
 # Author: James (Jimmy) Allah-Mensah
 # Date: 2/25/21
 # Version: Python 3.7
 
+# Throttled and transiently failing calls are retried by the rate governor (call_api), botocore's own retries would
+# multiply with its retries
+AWS_CLIENT_CONFIG = Config(retries={'max_attempts': 0})
+# s3transfer sends the parts of an upload_file itself, outside call_api, so upload clients keep botocore's retries
+TRANSFER_CLIENT_CONFIG = Config(retries={'mode': 'standard'})
 
 
 def getConfiguration(key):
@@ -37,6 +57,33 @@ def getConfiguration(key):
     ExplicitIntroductionList (Array): The methods (phrases) where the chance of the person's name appearing after is high
     MaxSpeakerLabels (Integer): The maximum number of speakers that can be identified. Max is 10.
     EditConfigOnStart (Boolean): Asks the user if they would like to view/edit configurations at the start of the program
+    PipelineCacheDirectory (String): Directory where pipeline artifacts are cached so unchanged stages are not re-run
+    PipelineMaxWorkers (Integer): The maximum number of pipeline stages that are run at the same time
+    AnalyticsBucketSeconds (Integer): Length of the time buckets, in seconds, used for the per speaker analytics
+    PhoneticSearch (Boolean): Whether searched words, phrases and watch words also match words that sound alike
+    HighlightPaddingSeconds (Integer): Seconds of media included before and after each exported highlight
+    HighlightMergeGapSeconds (Integer): Highlights at most this many seconds apart are exported as a single clip
+    HighlightWorkers (Integer): The maximum number of highlight clips that are cut at the same time
+    SummarySentences (Integer): The number of sentences in the summary page of the transcription PDF
+    SummaryWatchWordBoost (Float): How much each watch word mentioned in a sentence raises its summary score (0 to disable)
+    ApiRateLimits (Dictionary): Starting rate, highest rate (calls per second) and burst of each backend API, with a default for the others
+    ApiMaxRetries (Integer): The maximum number of times a throttled or transiently failing backend call is retried
+    TrimSilence (Boolean): Removes long silent stretches from the recording before it is uploaded, as a 16 kHz mono re-encode whose transcription times are mapped back to the original recording. Off by default
+    TrimMinSilenceSeconds (Float): The shortest silent stretch that is removed
+    TrimPaddingSeconds (Float): Seconds of silence kept on each side of a removed stretch
+    StreamingMode (Boolean): Streams the audio to AWS Transcribe streaming, showing each line and watch word as soon as it is recognized, instead of waiting for a batch job
+    StreamingIndexWindowSeconds (Integer): Seconds of recent speech that can be searched during a streaming session
+    FingerprintDedup (Boolean): Reuses the transcription of an already transcribed copy of the recording (re-encoded or trimmed) instead of uploading it again
+    FingerprintIndexDirectory (String): Directory where the audio fingerprints and transcriptions of transcribed recordings are kept
+    AutocompleteSuggestions (Integer): The number of completions and most said phrases offered by the search prompt
+    WatchDirectories (Array): Directories the watch folder daemon picks up new recordings from
+    WatchDestinationDirectory (String): Directory the watch folder daemon writes the outputs of every recording to
+    WatchQueuePath (String): SQLite file of the watch folder daemon's job queue
+    WatchWorkers (Integer): The number of recordings the watch folder daemon transcribes at the same time
+    WatchSettleSeconds (Integer): A new recording is picked up once it has not changed for this many seconds
+    WatchPollSeconds (Integer): Seconds between scans of the watched directories
+    WatchMaxAttempts (Integer): The number of times a recording is attempted before it is marked failed
+    WatchRetrySeconds (Integer): Wait before retrying a failed recording, doubled after every attempt
 
     '''
     with open('transcription_config.json') as file:
@@ -44,6 +91,28 @@ def getConfiguration(key):
     return data[key]
 
 
+def call_api(api_name, function, *args, **kwargs):
+    '''
+    Calls an AWS or translation function through the shared rate governor, so concurrent jobs stay within the API's
+    budget and throttled calls are retried at a lower rate
+    :param api_name: Name of the budget in ApiRateLimits (ex: transcribe.get_transcription_job)
+    :param function: The backend function
+    :return: The function's return value
+    '''
+    return rate_governor.get_governor(getConfiguration).call(api_name, function, *args, **kwargs)
+
+
+def aws_client(service_name, session=None, transfer=False):
+    '''
+    Creates a boto3 client for the calls made through call_api
+    :param service_name: AWS service (ex: s3)
+    :param session: boto3 Session the client is created from, the default session if None
+    :param transfer: Whether the client uploads files (upload_file), which keeps botocore's retries for the parts
+    '''
+    return (session or boto3).client(service_name,
+                                     config=TRANSFER_CLIENT_CONFIG if transfer else AWS_CLIENT_CONFIG)
+
+
 def calculate_s3_etag(file_path, chunk_size=8 * 1024 * 1024):
     '''
     Calculates the s3 etag (hash) of the audio file and compares to that of those already in the S3 bucket
@@ -152,22 +221,22 @@ def upload_file(file_name, bucket, object_name=None):
     if file_name is None:
         return None
 
-    s3_client = boto3.client('s3')
+    s3_client = aws_client('s3', transfer=True)
 
     try:
         print('Uploading file to S3 Bucket...')
-        for bucket_file in s3_client.list_objects(Bucket=bucket)['Contents']:
-            if file_name == bucket_file['Key'] or calculate_s3_etag(file_name) == bucket_file['ETag']:
+        for bucket_file in call_api('s3.list_objects', s3_client.list_objects, Bucket=bucket)['Contents']:
+            if object_name == bucket_file['Key'] or calculate_s3_etag(file_name) == bucket_file['ETag']:
                 error_msg = input(
                     'File: {} already exists\nWould you like to overwrite this file (Y/N):'.format(file_name))
                 if error_msg.lower()[0] == 'y':
-                    s3_client.delete_object(Bucket=bucket, Key=bucket_file['Key'])
+                    call_api('s3.delete_object', s3_client.delete_object, Bucket=bucket, Key=bucket_file['Key'])
                     print('Overwriting file...')
                 else:
                     return None
 
-        s3_client.upload_file(file_name, bucket, object_name)
-        file_path = ('s3://{}/' + file_name).format(bucket)
+        call_api('s3.upload_file', s3_client.upload_file, file_name, bucket, object_name)
+        file_path = ('s3://{}/' + object_name).format(bucket)
         print('File successfully overwritten.')
     except ClientError as e:
         logging.error(e)
@@ -182,8 +251,8 @@ def get_s3_bucket(preference):
     :return: name of available S3 Bucket
     '''
     print('Retrieving S3 Bucket Information...')
-    s3 = boto3.client('s3')
-    bucket_list = s3.list_buckets()['Buckets']
+    s3 = aws_client('s3')
+    bucket_list = call_api('s3.list_buckets', s3.list_buckets)['Buckets']
     if len(bucket_list) == 1:
         return bucket_list[0]['Name']
     else:
@@ -203,8 +272,9 @@ def is_job_name_unique(job_name):
     :param job_name: Name of the transcription job
     :return: False if the job name already exists, False if otherwise
     '''
-    s3_client = boto3.client('transcribe')
-    transcription_jobs = s3_client.list_transcription_jobs()['TranscriptionJobSummaries']
+    s3_client = aws_client('transcribe')
+    transcription_jobs = call_api('transcribe.list_transcription_jobs',
+                                  s3_client.list_transcription_jobs)['TranscriptionJobSummaries']
     for job in transcription_jobs:
         if job['TranscriptionJobName'] == job_name and job['TranscriptionJobStatus'] == 'COMPLETED':
             return False
@@ -236,7 +306,8 @@ def transcribe_file(file_uri, transcribe_client, job_name):
 
     language_options = getConfiguration("IncludedLanguages")
     if len(language_options) < 2:
-        transcribe_client.start_transcription_job(
+        call_api(
+            'transcribe.start_transcription_job', transcribe_client.start_transcription_job,
             TranscriptionJobName=job_name,
             Media={'MediaFileUri': file_uri},
             MediaFormat=getConfiguration('MediaFormat'),
@@ -247,7 +318,8 @@ def transcribe_file(file_uri, transcribe_client, job_name):
             }
         )
     else:
-        transcribe_client.start_transcription_job(
+        call_api(
+            'transcribe.start_transcription_job', transcribe_client.start_transcription_job,
             TranscriptionJobName=job_name,
             Media={'MediaFileUri': file_uri},
             MediaFormat=getConfiguration('MediaFormat'),
@@ -259,17 +331,30 @@ def transcribe_file(file_uri, transcribe_client, job_name):
             IdentifyLanguage=True
         )
 
-    max_tries = 100
+    return wait_for_transcription(transcribe_client, job_name)
+
+
+def wait_for_transcription(transcribe_client, job_name, max_tries=100):
+    '''
+    Waits for the transcription job to finish
+    :param transcribe_client: Boto3 AWS transcribe client
+    :param job_name: Name of transcription job
+    :param max_tries: The number of times the job status is checked, 10 seconds apart
+    :return: The Transcription JSON URI, None if the job failed or did not finish in time
+    '''
     while max_tries > 0:
         max_tries -= 1
-        job = transcribe_client.get_transcription_job(TranscriptionJobName=job_name)
+        job = call_api('transcribe.get_transcription_job', transcribe_client.get_transcription_job,
+                       TranscriptionJobName=job_name)
         job_status = job['TranscriptionJob']['TranscriptionJobStatus']
-        if job_status in ['COMPLETED', 'FAILED']:
+        if job_status == 'FAILED':
+            print(f"Job {job_name} is {job_status}: {job['TranscriptionJob'].get('FailureReason')}")
+            return None
+        if job_status == 'COMPLETED':
             print(f"Job {job_name} is {job_status}.")
-            if job_status == 'COMPLETED':
-                print(
-                    f"Download the transcript from\n"
-                    f"\t{job['TranscriptionJob']['Transcript']['TranscriptFileUri']}.")
+            print(
+                f"Download the transcript from\n"
+                f"\t{job['TranscriptionJob']['Transcript']['TranscriptFileUri']}.")
 
             print(str(job['TranscriptionJob']['Transcript']['TranscriptFileUri']))
             return str(job['TranscriptionJob']['Transcript']['TranscriptFileUri'])
@@ -279,6 +364,23 @@ def transcribe_file(file_uri, transcribe_client, job_name):
     return None
 
 
+def load_transcription(transcription_response):
+    '''
+    Loads the transcription JSON, downloading it only once per URI
+    :param transcription_response: Transcription JSON URI, or the already parsed transcription JSON
+    :return: The parsed transcription JSON
+    '''
+    if isinstance(transcription_response, dict):
+        return transcription_response
+    return download_transcription(transcription_response)
+
+
+@functools.lru_cache(maxsize=8)
+def download_transcription(transcription_uri):
+    response = urllib.request.urlopen(transcription_uri)
+    return json.loads(response.read())
+
+
 def format_transcription(transcription_response):
     '''
     Parses the JSON file into an easy to follow format, identify speakers
@@ -290,8 +392,7 @@ def format_transcription(transcription_response):
 
     print('Identifying the speakers and formatting text...')
     if transcription_response is not None:
-        response = urllib.request.urlopen(transcription_response)
-        data = json.loads(response.read())
+        data = load_transcription(transcription_response)
 
         transcript = data['results']['transcripts'][0]['transcript']
         word_list = transcript.split()
@@ -328,48 +429,60 @@ def translate_script(transcription_response, transcribed_data):
     :return:
     '''
     if transcribed_data is not None:
-        response = urllib.request.urlopen(transcription_response)
-        data = json.loads(response.read())
-        language_code = data['results']['language_code']
-
-        language_options = getConfiguration('LanguageOptions')
-        for dialects in list(language_options.values()):
-            for dialect in list(dialects.values()):
-                if dialect == language_code:
-                    detected_language = list(language_options.keys())[
-                        list(language_options.values()).index(dialects)]
-                    detected_dialect = list(dialects.keys())[list(dialects.values()).index(dialect)]
-                    break
-
-        print('The detected Language is: English'.format(detected_language))
-        translate_text = input(('Would you like to translate the transcribed audio?'))
-        if translate_text[0].lower() == 'y':
-            destination_language = input(
-                'Please enter the destination lanuage or type in \'options\' for language options:').lower()
-            while (destination_language not in list(
-                    googletrans.LANGUAGES.values()) and destination_language not in list(
-                googletrans.LANGUAGES.keys()) or (str(detected_language).lower() == destination_language.lower())):
-                if 'option' in destination_language:
-                    print('Language: Language Abbreviation')
-                    for google_trans_option in googletrans.LANGUAGES:
-                        print('{}: {}'.format(googletrans.LANGUAGES[google_trans_option], google_trans_option))
-                if destination_language.lower() == str(detected_language).lower():
-                    print('Destination language cannot be the same as the source language.')
-                destination_language = input(
-                    'Please enter the destination lanuage or type in \'options\' for language options:')
-
-            if destination_language.lower() in list(googletrans.LANGUAGES.values()):
-                destination_language = list(googletrans.LANGUAGES.keys())[
-                    list(googletrans.LANGUAGES.values()).index(destination_language)]
-            source_language = list(googletrans.LANGUAGES.keys())[
-                list(googletrans.LANGUAGES.values()).index(str(detected_language).lower())]
+        translation_languages = select_translation_languages(transcription_response)
+        if translation_languages is not None:
             print('Initiating translation...')
-            translated_transcribed_data = initiate_language_translation(transcribed_data, source_language, destination_language)
+            translated_transcribed_data = initiate_language_translation(transcribed_data, translation_languages[0],
+                                                                        translation_languages[1])
             return translated_transcribed_data
         else:
             return transcribed_data
     return None
 
+
+def select_translation_languages(transcription_response):
+    '''
+    Detects the source language and asks the user whether, and to which language, the text should be translated
+    :param transcription_response: Transcription JSON
+    :return: (source language, destination language) google translate codes, None if no translation is wanted
+    '''
+    data = load_transcription(transcription_response)
+    language_code = data['results']['language_code']
+
+    language_options = getConfiguration('LanguageOptions')
+    for dialects in list(language_options.values()):
+        for dialect in list(dialects.values()):
+            if dialect == language_code:
+                detected_language = list(language_options.keys())[
+                    list(language_options.values()).index(dialects)]
+                detected_dialect = list(dialects.keys())[list(dialects.values()).index(dialect)]
+                break
+
+    print('The detected Language is: English'.format(detected_language))
+    translate_text = input(('Would you like to translate the transcribed audio?'))
+    if translate_text[0].lower() == 'y':
+        destination_language = input(
+            'Please enter the destination lanuage or type in \'options\' for language options:').lower()
+        while (destination_language not in list(
+                googletrans.LANGUAGES.values()) and destination_language not in list(
+            googletrans.LANGUAGES.keys()) or (str(detected_language).lower() == destination_language.lower())):
+            if 'option' in destination_language:
+                print('Language: Language Abbreviation')
+                for google_trans_option in googletrans.LANGUAGES:
+                    print('{}: {}'.format(googletrans.LANGUAGES[google_trans_option], google_trans_option))
+            if destination_language.lower() == str(detected_language).lower():
+                print('Destination language cannot be the same as the source language.')
+            destination_language = input(
+                'Please enter the destination lanuage or type in \'options\' for language options:')
+
+        if destination_language.lower() in list(googletrans.LANGUAGES.values()):
+            destination_language = list(googletrans.LANGUAGES.keys())[
+                list(googletrans.LANGUAGES.values()).index(destination_language)]
+        source_language = list(googletrans.LANGUAGES.keys())[
+            list(googletrans.LANGUAGES.values()).index(str(detected_language).lower())]
+        return source_language, destination_language
+    return None
+
 def initiate_language_translation(transcribed_data, source_language, destination_language):
     '''
     Translates the text from the detected source language to the provided destination language
@@ -384,8 +497,8 @@ def initiate_language_translation(transcribed_data, source_language, destination
 
     for index, value in enumerate(transcribed_data):
         transcription_entry = transcribed_data[index]
-        translated_text = translator.translate(transcription_entry[1], lang_src=source_language,
-                                               lang_tgt=destination_language)
+        translated_text = call_api('translate', translator.translate, transcription_entry[1],
+                                   lang_src=source_language, lang_tgt=destination_language)
         translation_package = (transcription_entry[0], translated_text, transcription_entry[2])
         translated_transcribed_data.append(translation_package)
 
@@ -477,9 +590,15 @@ def get_time_from_word(transcription_response, speakers, is_watch_word, watch_wo
         formatted_speakers[format_speaker] = speakers[speaker]
 
     speakers = formatted_speakers
-    detection = input('Please enter a word or phrase: ').lower()
     if is_watch_word:
         detection = watch_word.lower()
+    else:
+        detection = prompt_search_text(transcription_response, speakers)
+
+    if getConfiguration("PhoneticSearch") and transcription_response is not None:
+        phonetic_times = get_phonetic_times(transcription_response, speakers, detection)
+        if phonetic_times is not None:
+            return phonetic_times
 
     speaker_dict = {}
     detected_times = []
@@ -493,8 +612,7 @@ def get_time_from_word(transcription_response, speakers, is_watch_word, watch_wo
             ignored_index = []
             suggestion_index = []
             if transcription_response is not None:
-                response = urllib.request.urlopen(transcription_response)
-                data = json.loads(response.read())
+                data = load_transcription(transcription_response)
                 segments = data['results']['items']
                 suggestions = {}
                 segment_index = 0
@@ -637,8 +755,7 @@ def get_time_from_word(transcription_response, speakers, is_watch_word, watch_wo
     else:
         while not found:
             if transcription_response is not None:
-                response = urllib.request.urlopen(transcription_response)
-                data = json.loads(response.read())
+                data = load_transcription(transcription_response)
                 segments = data['results']['items']
                 suggestion_list = {}
                 for segment in segments:
@@ -733,12 +850,143 @@ def get_time_from_word(transcription_response, speakers, is_watch_word, watch_wo
                     return return_dict
 
 
-def output_transcription(transcribed_data, job_name, speaker_dict):
+phonetic_indexes = {}
+
+
+def get_phonetic_index(transcription_response):
+    '''
+    Builds the phonetic index of the transcription, once per transcription
+    :param transcription_response: Transcription JSON
+    :return: The phonetic index
+    '''
+    data = load_transcription(transcription_response)
+    cached = phonetic_indexes.get(id(data))
+    if cached is None or cached[0] is not data:
+        if len(phonetic_indexes) >= 8:
+            phonetic_indexes.clear()
+        cached = (data, PhoneticIndex(data))
+        phonetic_indexes[id(data)] = cached
+    return cached[1]
+
+
+transcript_tries = {}
+
+
+def get_transcript_trie(transcription_response):
+    '''
+    Builds the prefix trie of the words and phrases of the transcription, once per transcription
+    :param transcription_response: Transcription JSON
+    :return: The transcript trie
+    '''
+    data = load_transcription(transcription_response)
+    cached = transcript_tries.get(id(data))
+    if cached is None or cached[0] is not data:
+        if len(transcript_tries) >= 8:
+            transcript_tries.clear()
+        cached = (data, TranscriptTrie(data))
+        transcript_tries[id(data)] = cached
+    return cached[1]
+
+
+def format_term_count(term, count, speaker_counts, speakers):
+    '''
+    Formats a word or phrase with the number of times it was said, overall and by each speaker
+    (ex: cloud security (12: James 8, Maria 4))
+    '''
+    by_speaker = ', '.join('{} {}'.format(speakers.get('spk_{}'.format(int(label.split('_')[1]) + 1), label), n)
+                           for label, n in sorted(speaker_counts.items(), key=lambda entry: -entry[1]) if label)
+    return '{} ({}{})'.format(term, count, ': ' + by_speaker if by_speaker else '')
+
+
+def install_completer(trie, num_suggestions):
+    '''
+    Completes the typed word or phrase with the Tab key, most said completions first, where readline is available
+    '''
+    try:
+        import readline
+    except ImportError:
+        return
+
+    def complete(text, state):
+        completions = trie.complete(text.lower(), num_suggestions)
+        return completions[state][0] if state < len(completions) else None
+
+    # The whole line is completed, so phrases complete across spaces
+    readline.set_completer_delims('')
+    readline.set_completer(complete)
+    readline.parse_and_bind('tab: complete')
+
+
+def prompt_search_text(transcription_response, speakers):
+    '''
+    Asks for the word or phrase to search for, showing the most said phrases first. Tab completes the typed text and
+    a prefix ending with * lists its ranked completions, so words do not have to be guessed
+    :param transcription_response: Transcription JSON
+    :param speakers: Speaker names keyed by speaker label (ex: {'spk_1': 'James'})
+    :return: The word or phrase, in lowercase
+    '''
+    if transcription_response is None:
+        return input('Please enter a word or phrase: ').lower()
+
+    num_suggestions = getConfiguration('AutocompleteSuggestions')
+    trie = get_transcript_trie(transcription_response)
+    print('Most said phrases: ' + ', '.join('{} ({})'.format(term, count)
+                                            for term, count in trie.top_phrases(num_suggestions)))
+    install_completer(trie, num_suggestions)
+    detection = input('Please enter a word or phrase (Tab to complete, end with * to list completions): ').lower()
+    while detection.endswith('*'):
+        completions = trie.complete(detection[:-1], num_suggestions)
+        if len(completions) == 0:
+            print('No words or phrases start with \'{}\''.format(detection[:-1]))
+        for index, (term, count) in enumerate(completions):
+            print('{}: {}'.format(index + 1, format_term_count(term, count, trie.lookup(term)[1], speakers)))
+        detection = input('Please enter a word or phrase, or the number of a completion: ').lower()
+        if detection.isnumeric() and 0 < int(detection) <= len(completions):
+            detection = completions[int(detection) - 1][0]
+    return detection.strip()
+
+
+def get_phonetic_times(transcription_response, speakers, detection):
+    '''
+    Identifies when the word or phrase, or a word or phrase that sounds alike, was said
+    :param transcription_response: Transcription JSON
+    :param speakers: Identified or default speaker names, keyed by speaker label (ex: spk_1)
+    :param detection: The word or phrase
+    :return: The timestamps of the word or phrase grouped by speaker, None if nothing sounding alike was said.
+             Sound-alike timestamps are followed by the heard text and its confidence
+    '''
+    hits = get_phonetic_index(transcription_response).search(detection)
+    if len(hits) == 0:
+        return None
+
+    print('The phrase: \'{}\' or a sound-alike was mentioned {} times during the following time(s):'.format(
+        detection, len(hits)))
+    return_dict = {
+        detection: {
+
+        }
+    }
+    for hit in hits:
+        speaker = hit['speaker_label']
+        if speaker is not None:
+            speaker = speakers.get(speaker.split("_")[0] + "_" + str(int(speaker.split("_")[1]) + 1), speaker)
+        hit_time = format_hit_time(hit)
+        print('{}: '.format(speaker) + hit_time)
+        if speaker not in return_dict[detection]:
+            return_dict[detection][speaker] = [hit_time]
+        else:
+            return_dict[detection][speaker].append(hit_time)
+    return return_dict
+
+
+def output_transcription(transcribed_data, job_name, speaker_dict, analytics=None, summary=None):
     '''
     Writes the formatted transcription to a PDF file
     :param transcribed_data: Formatted transcription
     :param job_name: Name of transcription job
     :param speaker_dict: Identified or defaulted speaker
+    :param analytics: Per speaker statistics, added as a speaker summary page if given
+    :param summary: Most important sentences of the transcription, added as a summary page if given
     :return: True if the transcription could be outputted
     '''
     if transcribed_data is None:
@@ -787,23 +1035,61 @@ def output_transcription(transcribed_data, job_name, speaker_dict):
 
     pdf.set_font("Helvetica", size=10)
     pdf.cell(200, 10, txt='Transcription made possible using AWS Transcribe.', ln=line_cnt + 1, align='L')
-    pdf.output('{}.pdf'.format(job_name.replace("_", " ")).title())
+    if summary is not None:
+        transcript_summary.add_summary_page(pdf, summary, speaker_dict)
+    if analytics is not None:
+        speaker_analytics.add_analytics_page(pdf, analytics, speaker_dict)
+    pdf.output(transcription_pdf_name(job_name))
     return True
 
 
-def recordTimes(speakers, job_name, transcription_response):
+def transcription_pdf_name(job_name):
+    '''
+    Returns the file name of the transcription PDF
+    :param job_name: Name of transcription job
+    '''
+    return '{}.pdf'.format(job_name.replace("_", " ")).title()
+
+
+def search_index_pdf_name(job_name):
+    '''
+    Returns the file name of the search index PDF
+    :param job_name: Name of transcription job
+    '''
+    job_name = job_name.replace('_', ' ').capitalize() + ' Search Index'
+    return '{}.pdf'.format(job_name.replace("_", " ")).title()
+
+
+def find_watch_word_times(transcription_response, speakers):
+    '''
+    Identifies when each of the watch words in the configuration file were said
+    :param transcription_response: Transcription JSON
+    :param speakers: Identified or default speaker names
+    :return: The times of each watch word that was mentioned, grouped by speaker
+    '''
+    print('Searching the transcribed text for watch words...')
+    watch_word_times = {}
+    for watch_word in getConfiguration('WatchWords'):
+        detected_times = get_time_from_word(transcription_response, speakers, True, watch_word)
+        if detected_times is not None:
+            watch_word_times[list(detected_times.keys())[0]] = detected_times[list(detected_times.keys())[0]]
+    return watch_word_times
+
+
+def recordTimes(speakers, job_name, transcription_response, watch_word_times=None, media_file=None):
     '''
     Identifies when the user said a specific word or phrase, output to a pdf file.
     :param speakers: Identified or default speaker names
     :param job_name: Name of transcription job
     :param transcription_response: Formatted transcription
+    :param watch_word_times: Times of the watch words, recorded along with the searched words or phrases
+    :param media_file: The transcribed media file, highlight clips of the recorded times can be cut from it
     :return:
     '''
     search_text = input('Transcription complete! Would you like to search the transcribed text for specific words or '
                         'phrases (Y/N):')
 
     recorded_times = {}
-    job_name = job_name.replace('_', ' ').capitalize()
     if search_text.lower()[0] == 'y':
         continue_search = True
         while continue_search:
@@ -815,55 +1101,93 @@ def recordTimes(speakers, job_name, transcription_response):
                 continue_search = False
         record = input('Would you like to record these times (Y/N):')
         if record.lower()[0] == 'y':
-            time_segments = list(recorded_times.values())
-            speaker_list = []
-            for time in time_segments:
-                speakers = time
-                for speaker in list(speakers.keys()):
-                    if speaker not in speaker_list:
-                        speaker_list.append(speaker)
-            word_cnt = 0
-            word_frequency = {}
-            for rec_time in recorded_times:
-                word_cnt = 0
-                for rec_speakers in recorded_times[rec_time]:
-                    for rec_time_seg in recorded_times[rec_time][rec_speakers]:
-                        word_cnt += 1
-
-                word_frequency[rec_time] = word_cnt
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.set_font("Arial", size=20)
-            pdf.cell(200, 10, txt=job_name.replace("_", " ").title() + " Search Index", ln=1, align='C')
-            line_cnt = 5
-            for word_or_phrase in recorded_times:
-                time_frequency = word_frequency[word_or_phrase]
-                pdf.set_font("Arial", 'B', size=16)
+            if watch_word_times is not None:
+                for watch_word in watch_word_times:
+                    if watch_word not in recorded_times:
+                        recorded_times[watch_word] = watch_word_times[watch_word]
+            if media_file is not None:
+                export_clips = input('Would you like to export highlight clips around these times (Y/N):')
+                if export_clips.lower()[0] == 'y':
+                    export_highlight_clips(recorded_times, job_name, media_file)
+            return write_search_index(recorded_times, job_name)
+    return False
+
+
+def export_highlight_clips(recorded_times, job_name, media_file):
+    '''
+    Cuts padded clips of the media around the recorded times, and joins them into a highlight reel
+    :param recorded_times: The times of each word or phrase, grouped by speaker
+    :param job_name: Name of transcription job
+    :param media_file: The transcribed media file
+    :return: Paths of the exported clips
+    '''
+    output_dir = '{} Highlights'.format(job_name.replace("_", " ")).title()
+    padding = getConfiguration('HighlightPaddingSeconds')
+    try:
+        clip_paths = highlight_export.export_highlights(media_file, recorded_times, output_dir, padding, padding,
+                                                        getConfiguration('HighlightMergeGapSeconds'),
+                                                        workers=getConfiguration('HighlightWorkers'))
+    except (OSError, subprocess.CalledProcessError) as e:
+        logging.error(e)
+        return []
+    print('Exported {} highlight clip(s) to {}'.format(len(clip_paths), output_dir))
+    return clip_paths
+
+
+def write_search_index(recorded_times, job_name):
+    '''
+    Writes the times of the searched words or phrases to the search index PDF file
+    :param recorded_times: The times of each word or phrase, grouped by speaker
+    :param job_name: Name of transcription job
+    :return: True if the search index could be outputted
+    '''
+    time_segments = list(recorded_times.values())
+    speaker_list = []
+    for time in time_segments:
+        speakers = time
+        for speaker in list(speakers.keys()):
+            if speaker not in speaker_list:
+                speaker_list.append(speaker)
+    word_cnt = 0
+    word_frequency = {}
+    for rec_time in recorded_times:
+        word_cnt = 0
+        for rec_speakers in recorded_times[rec_time]:
+            for rec_time_seg in recorded_times[rec_time][rec_speakers]:
+                word_cnt += 1
+
+        word_frequency[rec_time] = word_cnt
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=20)
+    pdf.cell(200, 10, txt=job_name.replace('_', ' ').capitalize().title() + " Search Index", ln=1, align='C')
+    line_cnt = 5
+    for word_or_phrase in recorded_times:
+        time_frequency = word_frequency[word_or_phrase]
+        pdf.set_font("Arial", 'B', size=16)
+        pdf.cell(200, 10, txt='', ln=line_cnt, align='L')
+        line_cnt += 1
+        pdf.cell(200, 10, txt="\'{}\' ".format(word_or_phrase.capitalize()), ln=line_cnt, align='L')
+        line_cnt += 1
+        pdf.set_font("Arial", '', size=14)
+        if time_frequency == 1:
+            pdf.cell(200, 10, txt="mentioned {} time \n".format(time_frequency), ln=line_cnt, align='L')
+        else:
+            pdf.cell(200, 10, txt="mentioned {} times \n".format(time_frequency), ln=line_cnt, align='L')
+
+        for speaker in speaker_list:
+            if speaker in list(recorded_times[word_or_phrase].keys()):
                 pdf.cell(200, 10, txt='', ln=line_cnt, align='L')
                 line_cnt += 1
-                pdf.cell(200, 10, txt="\'{}\' ".format(word_or_phrase.capitalize()), ln=line_cnt, align='L')
+                pdf.cell(200, 10, txt='{} \n'.format(speaker), ln=line_cnt, align='L')
                 line_cnt += 1
-                pdf.set_font("Arial", '', size=14)
-                if time_frequency == 1:
-                    pdf.cell(200, 10, txt="mentioned {} time \n".format(time_frequency), ln=line_cnt, align='L')
-                else:
-                    pdf.cell(200, 10, txt="mentioned {} times \n".format(time_frequency), ln=line_cnt, align='L')
-
-                for speaker in speaker_list:
-                    if speaker in list(recorded_times[word_or_phrase].keys()):
-                        pdf.cell(200, 10, txt='', ln=line_cnt, align='L')
-                        line_cnt += 1
-                        pdf.cell(200, 10, txt='{} \n'.format(speaker), ln=line_cnt, align='L')
-                        line_cnt += 1
-                        time_stamps = recorded_times[word_or_phrase][speaker]
-                        for time_stamp in time_stamps:
-                            pdf.cell(200, 10, txt='{} \n'.format(time_stamp), ln=line_cnt, align='L')
-                            line_cnt += 1
-                    line_cnt += 2
-            job_name += ' Search Index'
-            pdf.output('{}.pdf'.format(job_name.replace("_", " ")).title())
-            return True
-    return False
+                time_stamps = recorded_times[word_or_phrase][speaker]
+                for time_stamp in time_stamps:
+                    pdf.cell(200, 10, txt='{} \n'.format(time_stamp), ln=line_cnt, align='L')
+                    line_cnt += 1
+            line_cnt += 2
+    pdf.output(search_index_pdf_name(job_name))
+    return True
 
 
 def reserve_space(job_name, object_key, bucket):
@@ -877,10 +1201,11 @@ def reserve_space(job_name, object_key, bucket):
     reserve = input('Would you like to delete the transcription job and audio file to reserve space (Y/N):')
     if reserve.lower()[0] == 'y':
         try:
-            s3_client = boto3.client('s3')
-            s3_transcribe_client = boto3.client('transcribe')
-            s3_client.delete_object(Bucket=bucket, Key=object_key)
-            s3_transcribe_client.delete_transcription_job(TranscriptionJobName=job_name)
+            s3_client = aws_client('s3')
+            s3_transcribe_client = aws_client('transcribe')
+            call_api('s3.delete_object', s3_client.delete_object, Bucket=bucket, Key=object_key)
+            call_api('transcribe.delete_transcription_job', s3_transcribe_client.delete_transcription_job,
+                     TranscriptionJobName=job_name)
             print('Job {} & File {} have successfully been deleted.'.format(job_name, object_key))
             return True
         except ClientError as e:
@@ -889,41 +1214,333 @@ def reserve_space(job_name, object_key, bucket):
     return True
 
 
+def find_transcribed_copy(file_name):
+    '''
+    Checks the fingerprint index for an already transcribed copy of the media file, such as the same recording in
+    another format or bitrate, or a recording it was trimmed from
+    :param file_name: Audio or video file
+    :return: (transcription JSON of the copy in the times of the file or None, fingerprint of the file or None)
+    '''
+    if file_name is None or not getConfiguration('FingerprintDedup'):
+        return None, None
+    try:
+        fingerprint = audio_fingerprint.fingerprint_file(file_name)
+    except subprocess.CalledProcessError as e:
+        logging.error(e)
+        return None, None
+
+    try:
+        index = audio_fingerprint.FingerprintIndex(getConfiguration('FingerprintIndexDirectory'))
+        try:
+            match = index.find(fingerprint)
+        finally:
+            index.close()
+    except sqlite3.Error as e:
+        logging.error(e)
+        return None, fingerprint
+    if match is None:
+        return None, fingerprint
+    print('{} is a copy of {} (job {}) starting at {}, reusing its transcription.'.format(
+        file_name, match['file_name'], match['job_name'], time.strftime('%H:%M:%S', time.gmtime(match['offset']))))
+    return audio_fingerprint.reuse_transcription(match, fingerprint), fingerprint
+
+
+def index_transcription(file_name, fingerprint, transcription_response, job_name):
+    '''
+    Adds the fingerprint and transcription of a transcribed media file to the fingerprint index
+    '''
+    if fingerprint is None:
+        return
+    try:
+        index = audio_fingerprint.FingerprintIndex(getConfiguration('FingerprintIndexDirectory'))
+        try:
+            index.add(file_name, fingerprint, load_transcription(transcription_response), job_name)
+        finally:
+            index.close()
+    except sqlite3.Error as e:
+        logging.error(e)
+
+
+def start_or_resume_transcription(file_uri, transcribe_client, job_name, media_format):
+    '''
+    Starts the transcription job, or picks up the job of the same name if it was already started (ex: before a
+    restart), then waits for it to finish. A job of the same name that failed is deleted and started again, job names
+    are fixed per file so it would otherwise fail every retry
+    :param file_uri: Audio file path
+    :param transcribe_client: Boto3 AWS transcribe client
+    :param job_name: Name of transcription job
+    :param media_format: Format of the media file (ex: mp4)
+    :return: The Transcription JSON URI, None if the job failed
+    '''
+    try:
+        job = call_api('transcribe.get_transcription_job', transcribe_client.get_transcription_job,
+                       TranscriptionJobName=job_name)
+        start_job = job['TranscriptionJob']['TranscriptionJobStatus'] == 'FAILED'
+        if start_job:
+            print('Job {} failed: {}, starting it again'.format(job_name, job['TranscriptionJob'].get('FailureReason')))
+            call_api('transcribe.delete_transcription_job', transcribe_client.delete_transcription_job,
+                     TranscriptionJobName=job_name)
+    except ClientError as e:
+        # Transcribe answers an unknown job name with a bad request
+        if e.response['Error']['Code'] not in ('BadRequestException', 'NotFoundException'):
+            raise
+        start_job = True
+    if start_job:
+        settings = {'ShowSpeakerLabels': True, 'MaxSpeakerLabels': getConfiguration('MaxSpeakerLabels')}
+        if len(getConfiguration("IncludedLanguages")) < 2:
+            call_api('transcribe.start_transcription_job', transcribe_client.start_transcription_job,
+                     TranscriptionJobName=job_name, Media={'MediaFileUri': file_uri}, MediaFormat=media_format,
+                     LanguageCode=getConfiguration("DefaultLanguage"), Settings=settings)
+        else:
+            call_api('transcribe.start_transcription_job', transcribe_client.start_transcription_job,
+                     TranscriptionJobName=job_name, Media={'MediaFileUri': file_uri}, MediaFormat=media_format,
+                     LanguageOptions=getConfiguration("IncludedLanguages"), IdentifyLanguage=True,
+                     Settings=settings)
+    # Long recordings can take longer than the interactive wait
+    return wait_for_transcription(transcribe_client, job_name, max_tries=1000)
+
+
+def output_file_names(job_name):
+    '''
+    Returns the names of the files the transcription pipeline writes for a job
+    :param job_name: Name of transcription job
+    '''
+    return [transcription_pdf_name(job_name), search_index_pdf_name(job_name)] + \
+        speaker_analytics.analytics_file_names(job_name)
+
+
+def transcribe_unattended(file_name, job_name, s3_bucket_name):
+    '''
+    Runs the whole transcription on a media file without asking anything, for the watch folder daemon:
+    1. Reuses the transcription of an already transcribed copy, or trims, uploads and transcribes the file under a
+       key and job name derived from job_name, so running it again after a restart picks up the same job
+    2. Runs the transcription pipeline, without translation
+    3. Deletes the uploaded file, whether or not the run succeeded, and the transcription job
+    :param file_name: Audio or video file
+    :param job_name: Name of transcription job
+    :param s3_bucket_name: Name of S3 Bucket
+    :return: Names of the output files that were written
+    '''
+    session = boto3.session.Session()
+    object_key = 'condensor/{}{}'.format(job_name, os.path.splitext(file_name)[1].lower())
+    s3_client = aws_client('s3', session, transfer=True)
+    uploaded = False
+    try:
+        transcription_response, fingerprint = find_transcribed_copy(file_name)
+        if transcription_response is None:
+            upload_name, time_map = file_name, None
+            if getConfiguration('TrimSilence'):
+                upload_name, time_map = silence_trimming.trim_silence(
+                    file_name, os.path.join(getConfiguration('PipelineCacheDirectory'), 'trimmed', job_name),
+                    getConfiguration('TrimMinSilenceSeconds'), getConfiguration('TrimPaddingSeconds'))
+            call_api('s3.upload_file', s3_client.upload_file, upload_name, s3_bucket_name, object_key)
+            uploaded = True
+            transcription_response = start_or_resume_transcription(
+                's3://{}/{}'.format(s3_bucket_name, object_key), aws_client('transcribe', session), job_name,
+                os.path.splitext(file_name)[1][1:].lower())
+            if transcription_response is None:
+                raise RuntimeError('Transcription job {} did not complete'.format(job_name))
+            if time_map is not None:
+                transcription_response = silence_trimming.remap_transcription(
+                    copy.deepcopy(load_transcription(transcription_response)), time_map)
+            index_transcription(file_name, fingerprint, transcription_response, job_name)
+
+        run_transcription_pipeline(transcription_response, job_name)
+    finally:
+        # Failed runs upload the file again when they are retried, so the upload never outlives the run
+        if uploaded:
+            try:
+                call_api('s3.delete_object', s3_client.delete_object, Bucket=s3_bucket_name, Key=object_key)
+            except ClientError as e:
+                logging.error(e)
+
+    try:
+        call_api('transcribe.delete_transcription_job', aws_client('transcribe', session).delete_transcription_job,
+                 TranscriptionJobName=job_name)
+    except ClientError as e:
+        # Never created because the transcription was reused
+        logging.info(e)
+    return [output for output in output_file_names(job_name) if os.path.exists(output)]
+
+
+def translate_stage(formatted_transcription, translation_languages):
+    if formatted_transcription is None or translation_languages is None:
+        return formatted_transcription
+    print('Initiating translation...')
+    return initiate_language_translation(formatted_transcription, translation_languages[0], translation_languages[1])
+
+
+def speaker_analytics_stage(transcript, job_name):
+    print('Computing speaker analytics...')
+    analytics = speaker_analytics.analyze_transcription(transcript, getConfiguration('WatchWords'),
+                                                        getConfiguration('AnalyticsBucketSeconds'))
+    speaker_analytics.write_transcription_analytics(analytics, job_name)
+    return speaker_analytics.speaker_summary(analytics), analytics
+
+
+def summary_stage(translated_transcription):
+    print('Summarizing the transcription...')
+    return transcript_summary.summarize_transcription(translated_transcription, getConfiguration('SummarySentences'),
+                                                      getConfiguration('WatchWords'),
+                                                      getConfiguration('SummaryWatchWordBoost'))
+
+
+def watch_word_index_stage(watch_word_times, job_name):
+    if len(watch_word_times) == 0:
+        return False
+    return write_search_index(watch_word_times, job_name)
+
+
+def build_transcription_pipeline(job_name):
+    '''
+    Describes the transcription post-processing as a DAG of stages. Stages that do not depend on each other (ex: the
+    transcription PDF and the watch word search index) are run concurrently, and only the stages whose inputs or
+    configuration settings changed since the last run are re-run
+    :param job_name: Name of transcription job
+    :return: The transcription pipeline
+    '''
+    stages = [
+        Stage('transcript', load_transcription, inputs=['transcription_response'], cacheable=False),
+        Stage('formatted_transcription', format_transcription, inputs=['transcript']),
+        Stage('translated_transcription', translate_stage,
+              inputs=['formatted_transcription', 'translation_languages']),
+        Stage('speaker_names', identify_speakers, inputs=['translated_transcription'],
+              config_keys=['IntroductionCategories', 'ExplicitIntroductionList', 'NameIntroductionWordBound']),
+        Stage('speaker_analytics', speaker_analytics_stage, inputs=['transcript', 'job_name'],
+              outputs=['speaker_summary', 'speaker_analytics'],
+              config_keys=['WatchWords', 'AnalyticsBucketSeconds'],
+              files=speaker_analytics.analytics_file_names(job_name)),
+        Stage('transcript_summary', summary_stage, inputs=['translated_transcription'],
+              config_keys=['SummarySentences', 'WatchWords', 'SummaryWatchWordBoost']),
+        Stage('transcription_pdf', output_transcription,
+              inputs=['translated_transcription', 'job_name', 'speaker_names', 'speaker_summary',
+                      'transcript_summary'],
+              files=[transcription_pdf_name(job_name)]),
+        Stage('watch_word_times', find_watch_word_times,
+              inputs=['transcript', 'speaker_names'], config_keys=['WatchWords', 'PhoneticSearch']),
+        Stage('watch_word_index_pdf', watch_word_index_stage, inputs=['watch_word_times', 'job_name'],
+              files=[search_index_pdf_name(job_name)])
+    ]
+    cache_dir = os.path.join(getConfiguration('PipelineCacheDirectory'), job_name)
+    return Pipeline(stages, cache_dir, getConfiguration, max_workers=getConfiguration('PipelineMaxWorkers'))
+
+
+def run_transcription_pipeline(transcription_response, job_name, translation_languages=None):
+    '''
+    Formats, translates and identifies the speakers of the transcription, then writes the transcription and watch
+    word search index PDF files
+    :param transcription_response: Transcription JSON
+    :param job_name: Name of transcription job
+    :param translation_languages: (source language, destination language) if the text should be translated
+    :return: Dictionary of the pipeline artifacts, None if there is no transcription
+    '''
+    if transcription_response is None:
+        return None
+
+    pipeline = build_transcription_pipeline(job_name)
+    artifacts = pipeline.run(transcription_response=transcription_response, job_name=job_name,
+                             translation_languages=translation_languages)
+    if len(pipeline.executed) < len(pipeline.stages):
+        print('Re-ran {} of {} stages: {}'.format(len(pipeline.executed), len(pipeline.stages),
+                                                 ', '.join(pipeline.executed)))
+    return artifacts
+
+
 def transcribe_audio():
     '''
     1. Loads AWS S3 bucket information, with preference option
-    2. Searches for a file matching the desired media format within the script directory
-    3. Uploads file to AWS S3 Bucket
-    4. Creates the Transcription Job
-    5. Parses the JSON Response
-    6. Gives user an option to translate the text (supports over 40 languages)
-    7. Attempts to identify speaker names
-    8. Writes transcribed text to a PDF file
-    9. Identifies when the user said a specific word or phrase, output to a pdf file.
-    10. Give the user the option to remove files to reserve space
+    2. Searches for a file matching the desired media format within the script directory, and reuses the
+       transcription of an already transcribed copy of it if there is one (skipping steps 3 and 4)
+    3. Trims long silent stretches and uploads file to AWS S3 Bucket
+    4. Creates the Transcription Job, mapping its times back to the original recording if it was trimmed
+    5. Gives user an option to translate the text (supports over 40 languages)
+    6. Runs the transcription pipeline, re-running only the stages affected by changes:
+        Parses the JSON Response
+        Attempts to identify speaker names
+        Computes the per speaker analytics
+        Picks the most important sentences of the transcription
+        Writes transcribed text to a PDF file, with a summary and a speaker summary page
+        Records the times of the watch words to the search index PDF file
+    7. Identifies when the user said a specific word or phrase, output to a pdf file.
+    8. Give the user the option to remove files to reserve space
     :return:
     '''
     s3_bucket_name = get_s3_bucket(None)
     file_name = retrieve_audio()
-    file_uri = upload_file(file_name, s3_bucket_name)
-
+    transcription_response, fingerprint = find_transcribed_copy(file_name)
+    # Asked before trimming, the trimmed recording of every job is kept apart
     job_name = input('Please enter a transcription job name:').replace(" ", "_")
-    transcribe_client = boto3.client('transcribe')
-    transcription_response = transcribe_file(file_uri, transcribe_client, job_name)
+    object_key, time_map = None, None
+    if transcription_response is None:
+        upload_name = file_name
+        if file_name is not None:
+            # The trimmed recording is uploaded under the name of the original
+            object_key = os.path.basename(file_name)
+            if getConfiguration('TrimSilence'):
+                upload_name, time_map = silence_trimming.trim_silence(
+                    file_name, os.path.join(getConfiguration('PipelineCacheDirectory'), 'trimmed', job_name),
+                    getConfiguration('TrimMinSilenceSeconds'), getConfiguration('TrimPaddingSeconds'))
+        file_uri = upload_file(upload_name, s3_bucket_name, object_key)
+
+    if transcription_response is None:
+        transcribe_client = aws_client('transcribe')
+        transcription_response = transcribe_file(file_uri, transcribe_client, job_name)
+        if transcription_response is None:
+            return
+        if time_map is not None:
+            # The downloaded JSON is cached, the remapped copy is passed on instead
+            transcription_response = silence_trimming.remap_transcription(
+                copy.deepcopy(load_transcription(transcription_response)), time_map)
+        index_transcription(file_name, fingerprint, transcription_response, job_name)
 
-    transcribed_data = format_transcription(transcription_response)
-    transcribed_data = translate_script(transcription_response, transcribed_data)
-    speaker_names = identify_speakers(transcribed_data)
+    translation_languages = select_translation_languages(transcription_response)
+    artifacts = run_transcription_pipeline(transcription_response, job_name, translation_languages)
 
-    transcription_complete = output_transcription(transcribed_data, job_name, speaker_names)
-    time_retrievals = recordTimes(speaker_names, job_name, transcription_response)
+    time_retrievals = recordTimes(artifacts['speaker_names'], job_name, transcription_response,
+                                  artifacts['watch_word_times'], file_name)
 
-    if transcription_complete:
-        reserve_space(job_name, file_name, s3_bucket_name)
+    if artifacts['transcription_pdf'] and object_key is not None:
+        reserve_space(job_name, object_key, s3_bucket_name)
+
+    rate_governor.get_governor(getConfiguration).print_metrics()
+
+
+def transcribe_audio_streaming():
+    '''
+    1. Searches for a file matching the desired media format within the script directory
+    2. Streams its audio to AWS Transcribe streaming, printing every line and watch word as soon as it is recognized
+    3. Runs the transcription pipeline on the finished session, as in transcribe_audio
+    4. Identifies when the user said a specific word or phrase, output to a pdf file.
+    :return:
+    '''
+    file_name = retrieve_audio()
+    if file_name is None:
+        return
+
+    job_name = input('Please enter a transcription job name:').replace(" ", "_")
+    log_path = os.path.join(getConfiguration('PipelineCacheDirectory'), '{}.stream.jsonl'.format(job_name))
+    os.makedirs(getConfiguration('PipelineCacheDirectory'), exist_ok=True)
+    backend = streaming_transcription.TranscribeStreamingBackend(boto3.session.Session().region_name,
+                                                                 getConfiguration('DefaultLanguage'))
+    with open(log_path, 'w') as log_file:
+        session = streaming_transcription.StreamingSession(getConfiguration('WatchWords'),
+                                                           getConfiguration('StreamingIndexWindowSeconds'),
+                                                           log_file=log_file)
+        streaming_transcription.stream_transcription(
+            backend, streaming_transcription.audio_chunks(file_name, realtime=True), session)
+
+    transcription_response = streaming_transcription.read_session_log(log_path, getConfiguration('DefaultLanguage'))
+    translation_languages = select_translation_languages(transcription_response)
+    artifacts = run_transcription_pipeline(transcription_response, job_name, translation_languages)
+    recordTimes(artifacts['speaker_names'], job_name, transcription_response, artifacts['watch_word_times'],
+                file_name)
 
 
 def main():
-    transcribe_audio()
+    if getConfiguration('StreamingMode'):
+        transcribe_audio_streaming()
+    else:
+        transcribe_audio()
 
 if __name__ == '__main__':
     main()
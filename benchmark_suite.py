@@ -0,0 +1,322 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import synthetic_media
+
+# Author: James (Jimmy) Allah-Mensah
+# Version: Python 3.7
+
+# Recording lengths, in seconds, that every benchmark is measured at (5 minutes to 10 hours)
+DEFAULT_DURATIONS = [300, 1800, 7200, 36000]
+BASELINE_FILE = 'benchmark_baseline.json'
+DEFAULT_REPEAT = 5
+# Slowdowns of fewer seconds than this are timing noise on the millisecond stages and never count as regressions
+DEFAULT_MIN_SLOWDOWN = 0.05
+
+
+@contextlib.contextmanager
+def quiet():
+    '''
+    Hides the progress output of the benchmarked functions
+    '''
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+@contextlib.contextmanager
+def working_directory(path):
+    current_directory = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(current_directory)
+
+
+class Workload:
+    '''
+    The synthetic inputs of one point of the size sweep, generated once and shared by every benchmark
+    '''
+
+    def __init__(self, duration, num_speakers, vocabulary, work_dir):
+        import audio_transcriber
+
+        self.duration = duration
+        self.work_dir = work_dir
+        self.transcription = synthetic_media.generate_transcription(duration, num_speakers, vocabulary)
+        with quiet():
+            self.formatted = audio_transcriber.format_transcription(self.transcription)
+            self.speakers = audio_transcriber.identify_speakers(self.formatted)
+        self._video = None
+        self._keyframe_video = None
+        self._hd_video = None
+
+    @property
+    def video(self):
+        if self._video is None:
+            path = os.path.join(self.work_dir, 'synthetic_{}.mp4'.format(self.duration))
+            slide_times = synthetic_media.generate_slide_times(self.duration)
+            synthetic_media.generate_slide_video(path, self.duration, slide_times)
+            self._video = path
+        return self._video
+
+    @property
+    def keyframe_video(self):
+        '''
+        The same slide deck encoded with a keyframe at every slide, as screen recording encoders do
+        '''
+        if self._keyframe_video is None:
+            path = os.path.join(self.work_dir, 'synthetic_keyframes_{}.mp4'.format(self.duration))
+            slide_times = synthetic_media.generate_slide_times(self.duration)
+            synthetic_media.generate_slide_video(path, self.duration, slide_times, keyframes_at_slides=True)
+            self._keyframe_video = path
+        return self._keyframe_video
+
+    @property
+    def hd_video(self):
+        '''
+        The same slide deck as a 720p video at 25 frames per second, as lectures are recorded
+        '''
+        if self._hd_video is None:
+            path = os.path.join(self.work_dir, 'synthetic_hd_{}.mp4'.format(self.duration))
+            slide_times = synthetic_media.generate_slide_times(self.duration)
+            synthetic_media.generate_slide_video(path, self.duration, slide_times, size=(1280, 720), fps=25)
+            self._hd_video = path
+        return self._hd_video
+
+
+def bench_format_transcription(workload):
+    import audio_transcriber
+    with quiet():
+        audio_transcriber.format_transcription(workload.transcription)
+
+
+def bench_identify_speakers(workload):
+    import audio_transcriber
+    with quiet():
+        audio_transcriber.identify_speakers(workload.formatted)
+
+
+def bench_get_time_from_word(workload):
+    import audio_transcriber
+    with quiet():
+        audio_transcriber.get_time_from_word(workload.transcription, workload.speakers, True, 'cloud')
+
+
+def bench_get_time_from_phrase(workload):
+    import audio_transcriber
+    with quiet():
+        audio_transcriber.get_time_from_word(workload.transcription, workload.speakers, True,
+                                             'artificial intelligence')
+
+
+def bench_output_transcription(workload):
+    import audio_transcriber
+    with quiet(), working_directory(workload.work_dir):
+        audio_transcriber.output_transcription(workload.formatted, 'benchmark_job', workload.speakers)
+
+
+def bench_frame_iteration(workload):
+    import condensor_video
+    video = workload.video
+    with quiet():
+        condensor_video.frame_iteration(video, 10, 10, 20)
+
+
+def bench_frame_iteration_adaptive(workload):
+    import condensor_video
+    video = workload.video
+    with quiet():
+        condensor_video.frame_iteration_adaptive(video, 10, 10, 20)
+
+
+def bench_frame_iteration_hd(workload):
+    import condensor_video
+    video = workload.hd_video
+    with quiet():
+        condensor_video.frame_iteration(video, 10, 10, 20)
+
+
+def bench_frame_iteration_adaptive_hd(workload):
+    import condensor_video
+    video = workload.hd_video
+    with quiet():
+        condensor_video.frame_iteration_adaptive(video, 10, 10, 20)
+
+
+def bench_frame_iteration_keyframes(workload):
+    import condensor_video
+    video = workload.keyframe_video
+    with quiet():
+        condensor_video.frame_iteration_keyframes(video, 10, 10, 20)
+
+
+# Benchmark name: (function, longest recording it is measured at, None for no limit). The phrase search and the
+# video benchmarks are limited since they take minutes per run on the longest recordings, the 720p ones the most
+BENCHMARKS = {
+    'format_transcription': (bench_format_transcription, None),
+    'identify_speakers': (bench_identify_speakers, None),
+    'get_time_from_word': (bench_get_time_from_word, None),
+    'get_time_from_phrase': (bench_get_time_from_phrase, 7200),
+    'output_transcription': (bench_output_transcription, None),
+    'frame_iteration': (bench_frame_iteration, 1800),
+    'frame_iteration_adaptive': (bench_frame_iteration_adaptive, 1800),
+    'frame_iteration_keyframes': (bench_frame_iteration_keyframes, 1800),
+    'frame_iteration_hd': (bench_frame_iteration_hd, 300),
+    'frame_iteration_adaptive_hd': (bench_frame_iteration_adaptive_hd, 300)
+}
+
+# Workload inputs generated on first use, by benchmark. They are generated before the benchmark is timed
+BENCHMARK_INPUTS = {
+    'frame_iteration': 'video',
+    'frame_iteration_adaptive': 'video',
+    'frame_iteration_keyframes': 'keyframe_video',
+    'frame_iteration_hd': 'hd_video',
+    'frame_iteration_adaptive_hd': 'hd_video'
+}
+
+
+def measure(function, workload, repeat):
+    '''
+    Runs a benchmark several times
+    :return: The median run time in seconds
+    '''
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(workload)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def run_benchmarks(names, durations, num_speakers=4, vocabulary=None, repeat=DEFAULT_REPEAT, include_limited=False):
+    '''
+    Measures every selected benchmark across the size sweep
+    :param names: Names of the benchmarks to run
+    :param durations: Synthetic recording lengths in seconds
+    :param num_speakers: Number of speakers in the synthetic transcriptions
+    :param vocabulary: Words used in the synthetic transcriptions
+    :param repeat: Number of runs per measurement, the median is kept
+    :param include_limited: Whether to measure benchmarks beyond their recording length limit
+    :return: Benchmark results, {benchmark: {duration: seconds}}
+    '''
+    results = {name: {} for name in names}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for duration in durations:
+            workload = Workload(duration, num_speakers, vocabulary, work_dir)
+            for name in names:
+                function, max_duration = BENCHMARKS[name]
+                if max_duration is not None and duration > max_duration and not include_limited:
+                    continue
+                try:
+                    if name in BENCHMARK_INPUTS:
+                        getattr(workload, BENCHMARK_INPUTS[name])
+                    seconds = measure(function, workload, repeat)
+                except ImportError as e:
+                    print('Skipping {}: {}'.format(name, e))
+                    continue
+                results[name][str(duration)] = seconds
+                print('{:<28} {:>7}s  {:10.4f}s'.format(name, duration, seconds))
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold, min_slowdown=DEFAULT_MIN_SLOWDOWN):
+    '''
+    Compares the results against the stored baseline
+    :param results: Benchmark results
+    :param baseline: Baseline benchmark results
+    :param threshold: Maximum allowed ratio of the result to the baseline (ex: 1.5 allows a 50% slowdown)
+    :param min_slowdown: Slowdowns of fewer seconds than this are timing noise and never count as regressions
+    :return: List of (benchmark, duration, baseline seconds, seconds, ratio) of every regression
+    '''
+    regressions = []
+    for name in results:
+        for duration, seconds in results[name].items():
+            baseline_seconds = baseline.get(name, {}).get(duration)
+            if baseline_seconds is None or baseline_seconds <= 0:
+                continue
+            ratio = seconds / baseline_seconds
+            print('{:<28} {:>7}s  {:10.4f}s vs {:10.4f}s  x{:.2f}'.format(name, duration, seconds, baseline_seconds,
+                                                                          ratio))
+            if ratio > threshold and seconds - baseline_seconds > min_slowdown:
+                regressions.append((name, duration, baseline_seconds, seconds, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the hot paths of the transcription and video '
+                                                 'condensor on synthetic recordings, no AWS access needed.')
+    parser.add_argument('--benchmarks', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--durations', nargs='+', type=int, default=DEFAULT_DURATIONS,
+                        help='Synthetic recording lengths in seconds')
+    parser.add_argument('--speakers', type=int, default=4)
+    parser.add_argument('--vocabulary', help='Text file of words used in the synthetic transcriptions')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help='Number of runs per measurement, the median is kept')
+    parser.add_argument('--include-limited', action='store_true',
+                        help='Also run the slow benchmarks on recordings longer than their limit')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--threshold', type=float, default=1.5)
+    parser.add_argument('--min-slowdown', type=float, default=DEFAULT_MIN_SLOWDOWN,
+                        help='Slowdowns of fewer seconds than this are ignored')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='Store the results in the baseline instead of comparing')
+    arguments = parser.parse_args()
+
+    vocabulary = None
+    if arguments.vocabulary:
+        with open(arguments.vocabulary) as file:
+            vocabulary = file.read().split()
+
+    results = run_benchmarks(arguments.benchmarks, arguments.durations, arguments.speakers, vocabulary,
+                             arguments.repeat, arguments.include_limited)
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'results': results
+    }
+    with open(arguments.output, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    if arguments.update_baseline:
+        # Benchmarks and sizes that were not run keep their stored baseline
+        if os.path.exists(arguments.baseline):
+            with open(arguments.baseline) as file:
+                stored_results = json.load(file)['results']
+            for name in stored_results:
+                stored_results[name].update(results.get(name, {}))
+            for name in results:
+                stored_results.setdefault(name, results[name])
+            report['results'] = stored_results
+        with open(arguments.baseline, 'w') as file:
+            json.dump(report, file, indent=2)
+        print('Baseline written to {}'.format(arguments.baseline))
+        return
+
+    if not os.path.exists(arguments.baseline):
+        print('No baseline found at {}, run with --update-baseline to create one.'.format(arguments.baseline))
+        return
+
+    with open(arguments.baseline) as file:
+        baseline = json.load(file)['results']
+    regressions = compare_to_baseline(results, baseline, arguments.threshold, arguments.min_slowdown)
+    if len(regressions) > 0:
+        print('{} benchmark(s) regressed by more than x{}:'.format(len(regressions), arguments.threshold))
+        for name, duration, baseline_seconds, seconds, ratio in regressions:
+            print('  {} at {}s: {:.4f}s -> {:.4f}s (x{:.2f})'.format(name, duration, baseline_seconds, seconds, ratio))
+        sys.exit(1)
+    print('No regressions found.')
+
+
+if __name__ == '__main__':
+    main()
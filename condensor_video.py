@@ -1,6 +1,11 @@
 import numpy as np
 import random
+import re
+import shutil
+import subprocess
+import tempfile
 from PIL import Image as im
+from PIL import ImageDraw
 from fpdf import *
 import os
 import time
@@ -8,9 +13,13 @@ import time
 env = os.environ
 target = "IMAGEIO_FFMPEG_EXE"
 path = "/Users/stefanjp/Downloads/ffmpeg"
-env[target] = path
+if os.path.exists(path):
+    env[target] = path
 from moviepy.editor import *
 
+# Frame iteration stops at this second
+MAX_FRAME = 4100
+
 
 def get_dimensions(video_clip):
     return video_clip.size
@@ -74,7 +83,7 @@ def frame_iteration(filename, timeThreshold, changeThreshold, amountOfSamples):
     timestamps = []
 
     currentFrame = 0
-    while currentFrame <= frames and currentFrame < 4100:
+    while currentFrame <= frames and currentFrame < MAX_FRAME:
 
         current_value = update_values(clip, currentFrame, samples)
 
@@ -89,7 +98,252 @@ def frame_iteration(filename, timeThreshold, changeThreshold, amountOfSamples):
     return timestamps
 
 
-def write_to_PDF(timestamps, clip_filename):
+def frame_iteration_adaptive(filename, timeThreshold, changeThreshold, amountOfSamples, gridStep=20):
+    '''
+    Finds the same slide changes as frame_iteration while decoding fewer frames. Frames are compared on a coarse grid
+    of gridStep seconds, and when a grid point differs from the reference frame the interval is bisected for the first
+    changed second, so a span without any change costs a single comparison and a change about log2(gridStep) more.
+    Every comparison is a seek, which restarts moviepy's ffmpeg reader, so on small low frame rate videos, where
+    decoding is cheap, this is slower than frame_iteration; on 720p lecture videos it is several times faster. A
+    slide replaced by the reference slide again within one grid step, or a change that is undone before the bisected
+    second, is not detected. Lower gridStep for such videos.
+    :param filename: Video file path
+    :param timeThreshold: Seconds skipped after each detected change
+    :param changeThreshold: Colour difference above which a frame counts as a new slide
+    :param amountOfSamples: Number of sampled pixels per frame
+    :param gridStep: Seconds between the frames compared on the coarse grid
+    :return: Seconds at which the slide changes
+    '''
+    clip = VideoFileClip(filename)
+    # A fresh reader cannot seek to the very end of the video, stop at the last second with a frame in it
+    lastFrame = min(int(np.ceil(clip.duration)) - 1, MAX_FRAME - 1)
+    dimensions = get_dimensions(clip)
+    samples = create_samples(amountOfSamples, dimensions)
+    values = {}
+
+    def value_at(frameNum):
+        if frameNum not in values:
+            values[frameNum] = update_values(clip, frameNum, samples)
+        return values[frameNum]
+
+    def changed(frameNum):
+        return color_difference(value_at(frameNum), reference_value) > changeThreshold
+
+    reference_value = value_at(0)
+    timestamps = []
+
+    currentFrame = 0
+    while currentFrame <= lastFrame:
+        gridFrame = min(currentFrame + gridStep, lastFrame)
+        if not changed(gridFrame):
+            currentFrame = gridFrame + 1
+            continue
+
+        # The slide changed somewhere in [currentFrame, gridFrame], bisect for the first changed second
+        low = currentFrame
+        high = gridFrame
+        while low < high:
+            middle = (low + high) // 2
+            if changed(middle):
+                high = middle
+            else:
+                low = middle + 1
+
+        timestamps.append(high)
+        reference_value = value_at(high)
+        print(high)
+        currentFrame = high + timeThreshold
+    print(len(timestamps))
+    print('Decoded {} of {} frames'.format(len(values), lastFrame + 1))
+    clip.close()
+    return timestamps
+
+
+def get_ffmpeg_binary():
+    from moviepy.config import get_setting
+    return get_setting("FFMPEG_BINARY")
+
+
+def list_keyframe_times(filename):
+    '''
+    Lists the timestamps of the keyframes (I-frames) of the first video stream. The packet index is read with ffprobe
+    without decoding anything; if ffprobe is not installed, ffmpeg decodes only the keyframes and reports their times
+    :param filename: Video file path
+    :return: Sorted keyframe times in seconds
+    '''
+    ffmpeg = get_ffmpeg_binary()
+    ffprobe = shutil.which('ffprobe') or shutil.which(os.path.join(os.path.dirname(ffmpeg), 'ffprobe'))
+    times = []
+    if ffprobe is not None:
+        output = subprocess.run([ffprobe, '-v', 'error', '-select_streams', 'v:0', '-show_entries',
+                                 'packet=pts_time,flags', '-of', 'csv=p=0', filename],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True).stdout.decode()
+        for line in output.splitlines():
+            fields = line.split(',')
+            if len(fields) >= 2 and 'K' in fields[1] and fields[0] not in ('', 'N/A'):
+                times.append(float(fields[0]))
+    else:
+        output = subprocess.run([ffmpeg, '-hide_banner', '-nostats', '-skip_frame', 'nokey', '-i', filename,
+                                 '-map', '0:v:0', '-vf', 'showinfo', '-f', 'null', '-'],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True).stderr.decode()
+        for match in re.finditer(r'pts_time:\s*(-?[\d.]+)', output):
+            times.append(float(match.group(1)))
+    return sorted(set(times))
+
+
+def is_fixed_gop(keyframe_times, tolerance=0.05):
+    '''
+    Checks whether keyframes are placed at a fixed interval instead of at scene cuts, in which case they say nothing
+    about slide changes
+    :param keyframe_times: Sorted keyframe times in seconds
+    :param tolerance: Allowed difference, in seconds, from the typical keyframe interval
+    :return: True if almost every keyframe interval is the same
+    '''
+    if len(keyframe_times) < 3:
+        return True
+    intervals = np.diff(keyframe_times)
+    regular = np.abs(intervals - np.median(intervals)) <= tolerance
+    # The last interval is often cut short by the end of the video
+    return regular[:-1].mean() >= 0.9
+
+
+def decode_keyframe_values(filename, width, height, samples):
+    '''
+    Decodes only the keyframes (ffmpeg -skip_frame nokey) of the first video stream, scaled to width x height, in a
+    single forward pass, and averages the sampled pixels of each
+    :param samples: Sampled [row, column] pixels, see create_samples
+    :return: (keyframe times in seconds, average RGB value of each keyframe)
+    '''
+    frame_size = width * height * 3
+    values = []
+    # showinfo logs the time of every decoded frame, it goes to a file so the pipe of frames never blocks on it
+    with tempfile.TemporaryFile() as log:
+        process = subprocess.Popen([get_ffmpeg_binary(), '-hide_banner', '-nostats', '-skip_frame', 'nokey',
+                                    '-i', filename, '-map', '0:v:0', '-vsync', '0',
+                                    '-vf', 'showinfo,scale={}:{}'.format(width, height),
+                                    '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-'],
+                                   stdout=subprocess.PIPE, stderr=log)
+        while True:
+            data = process.stdout.read(frame_size)
+            if len(data) < frame_size:
+                break
+            frame = np.frombuffer(data, dtype=np.uint8).reshape((height, width, 3))
+            values.append(average_RGB_value(get_pixel_values_all(frame, samples)))
+        process.stdout.close()
+        process.wait()
+        log.seek(0)
+        times = [float(match) for match in re.findall(r'pts_time:\s*(-?[\d.]+)',
+                                                       log.read().decode(errors='replace'))]
+    count = min(len(times), len(values))
+    return times[:count], values[:count]
+
+
+def frame_iteration_keyframes(filename, timeThreshold, changeThreshold, amountOfSamples, scale=0.25,
+                              fallbackMode='dense', gridStep=20):
+    '''
+    Finds the slide changes by decoding only the keyframes, at reduced resolution, in a single ffmpeg pass. Screen
+    recording and lecture encoders place keyframes at scene cuts, so a slide change usually starts at a keyframe.
+    Not every change gets its own keyframe (a cheap change can be encoded as a P-frame): when the second before a
+    changed keyframe already differs, the seconds since the previous keyframe are compared one by one, reading
+    forward, as frame_iteration would. Streams with a fixed keyframe interval fall back to the fallbackMode scan
+    :param scale: Fraction of the original resolution the keyframes are decoded at
+    :return: Seconds at which the slides change
+    '''
+    clip = VideoFileClip(filename, audio=False)
+    # Even dimensions, which every pixel format can be scaled to
+    width = max(2, int(clip.size[0] * scale) // 2 * 2)
+    height = max(2, int(clip.size[1] * scale) // 2 * 2)
+    lastFrame = min(int(clip.duration - 1.0 / clip.fps), MAX_FRAME - 1)
+    clip.close()
+    samples = create_samples(amountOfSamples, (width, height))
+    keyframe_times, values = decode_keyframe_values(filename, width, height, samples)
+    if is_fixed_gop(keyframe_times):
+        print('Keyframes are placed at a fixed interval, falling back to the {} scan'.format(fallbackMode))
+        return detect_slide_changes(filename, timeThreshold, changeThreshold, amountOfSamples, fallbackMode, gridStep)
+
+    # The seconds between keyframes are only decoded when a change has to be located, always reading forward
+    clips = []
+
+    def value_at(frameNum):
+        if len(clips) == 0:
+            clips.append(VideoFileClip(filename, audio=False, target_resolution=(height, width)))
+        return update_values(clips[0], frameNum, samples)
+
+    def changed(value):
+        return color_difference(value, reference_value) > changeThreshold
+
+    # The first whole second showing each keyframe, the second frame_iteration would report it at. The last second
+    # is checked as well, for changes after the last keyframe
+    seconds = [int(np.ceil(round(keyframe_time, 3))) for keyframe_time in keyframe_times]
+    checks = [(second, value) for second, value in zip(seconds, values) if second <= lastFrame]
+    if len(checks) == 0 or checks[-1][0] < lastFrame:
+        checks.append((lastFrame, None))
+
+    reference_value = values[0]
+    timestamps = []
+    nextFrame = 0
+    previousFrame = 0
+    decoded = 0
+    for currentFrame, value in checks:
+        if value is None:
+            value = value_at(currentFrame)
+            decoded += 1
+        if currentFrame >= nextFrame and changed(value):
+            low = max(previousFrame + 1, nextFrame)
+            if low < currentFrame and changed(value_at(currentFrame - 1)):
+                decoded += 1
+                frameNum = low
+                while frameNum < currentFrame:
+                    frame_value = value_at(frameNum)
+                    decoded += 1
+                    if changed(frame_value):
+                        timestamps.append(frameNum)
+                        reference_value = frame_value
+                        print(frameNum)
+                        frameNum += timeThreshold
+                        nextFrame = frameNum
+                    else:
+                        frameNum += 1
+            if currentFrame >= nextFrame and changed(value):
+                timestamps.append(currentFrame)
+                reference_value = value
+                print(currentFrame)
+                nextFrame = currentFrame + timeThreshold
+        previousFrame = currentFrame
+    for clip in clips:
+        clip.close()
+    print(len(timestamps))
+    print('Decoded {} keyframes and {} other frames'.format(len(keyframe_times), decoded))
+    return timestamps
+
+
+def detect_slide_changes(filename, timeThreshold, changeThreshold, amountOfSamples, mode='dense', gridStep=20):
+    '''
+    Finds the seconds at which the slides change
+    :param mode: 'dense' compares every second, 'adaptive' searches a coarse grid and scans changed intervals,
+                 'keyframe' only decodes the keyframes (falling back to 'dense' for fixed keyframe intervals)
+    :return: Seconds at which the slide changes
+    '''
+    if mode == 'dense':
+        return frame_iteration(filename, timeThreshold, changeThreshold, amountOfSamples)
+    elif mode == 'adaptive':
+        return frame_iteration_adaptive(filename, timeThreshold, changeThreshold, amountOfSamples, gridStep)
+    elif mode == 'keyframe':
+        return frame_iteration_keyframes(filename, timeThreshold, changeThreshold, amountOfSamples,
+                                         gridStep=gridStep)
+    raise ValueError('Unknown slide change detection mode: {}'.format(mode))
+
+
+def write_to_PDF(timestamps, clip_filename, layout='pages', columns=3, rows=4, quality=75, appendix=False):
+    '''
+    Writes the slides to a PDF file
+    :param layout: 'pages' writes one page per slide, 'contact_sheet' tiles columns x rows slides per page (see
+                   write_contact_sheet_PDF)
+    '''
+    if layout == 'contact_sheet':
+        return write_contact_sheet_PDF(timestamps, clip_filename, columns, rows, quality=quality, appendix=appendix)
+    elif layout != 'pages':
+        raise ValueError('Unknown slide PDF layout: {}'.format(layout))
     clip = VideoFileClip(clip_filename)
     pdf = FPDF(orientation='P')
     pdf.add_page()
@@ -122,6 +376,111 @@ def write_to_PDF(timestamps, clip_filename):
     clip.close()
 
 
-string = "/Users/stefanjp/12403/Spring Innovation Expo 2021-04-29-14-44-28.mp4"
-times = frame_iteration(string, 10, 10, 20)
-write_to_PDF(times, string)
+def fit_frame(frame, height, width):
+    '''
+    Centers a downscaled frame on a black tile of exactly height x width, the decoder's rounding can leave the frame a
+    pixel off the requested size
+    '''
+    frame = frame[:height, :width]
+    tile = np.zeros((height, width, 3), dtype=np.uint8)
+    top = (height - frame.shape[0]) // 2
+    left = (width - frame.shape[1]) // 2
+    tile[top:top + frame.shape[0], left:left + frame.shape[1]] = frame
+    return tile
+
+
+def compose_contact_sheet(tiles, columns, gap=8):
+    '''
+    Tiles equally sized frames into a single sheet, left to right then top to bottom
+    :param tiles: List of equally sized frames (height x width x 3 arrays), a page's worth
+    :return: The sheet as a height x width x 3 array, as many rows high as the tiles fill
+    '''
+    tile_height, tile_width = tiles[0].shape[:2]
+    used_rows = (len(tiles) + columns - 1) // columns
+    sheet = np.full((used_rows * (tile_height + gap) + gap, columns * (tile_width + gap) + gap, 3), 255,
+                    dtype=np.uint8)
+    for index, tile in enumerate(tiles):
+        top = gap + (index // columns) * (tile_height + gap)
+        left = gap + (index % columns) * (tile_width + gap)
+        sheet[top:top + tile_height, left:left + tile_width] = tile
+        # Darken the bottom of the tile so the burned in timestamp is readable on any slide
+        band = sheet[top + tile_height - 16:top + tile_height, left:left + tile_width]
+        band[:] = band // 3
+    return sheet
+
+
+def burn_in_timestamps(picture, labels, tile_height, tile_width, columns, gap=8):
+    '''
+    Writes the label of every tile into its darkened bottom band
+    '''
+    draw = ImageDraw.Draw(picture)
+    for index, label in enumerate(labels):
+        top = gap + (index // columns) * (tile_height + gap)
+        left = gap + (index % columns) * (tile_width + gap)
+        draw.text((left + 4, top + tile_height - 14), label, fill=(255, 255, 255))
+
+
+def write_contact_sheet_PDF(timestamps, clip_filename, columns=3, rows=4, tile_width=320, quality=75, appendix=False,
+                            output_path=None):
+    '''
+    Writes the slides as contact sheets, columns x rows downscaled slides per page with their time burned in, so a
+    long talk stays skimmable in a few pages. The frames are decoded at tile size, tiled with NumPy and every sheet
+    is encoded once as a JPEG, which the PDF embeds as is
+    :param timestamps: Seconds at which the slides change
+    :param clip_filename: Video file path
+    :param columns: Slides per row
+    :param rows: Rows per page
+    :param tile_width: Width of each slide in pixels
+    :param quality: JPEG quality of the sheets and the appendix (1 to 95)
+    :param appendix: Whether to add one full resolution page per slide after the sheets
+    :param output_path: Output PDF path, condensor_contact_sheet.pdf in the condensor folder of the desktop by default
+    :return: The output path
+    '''
+    if output_path is None:
+        output_dir = os.path.join(os.path.expanduser('~'), 'Desktop', 'condensor')
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir, 'condensor_contact_sheet.pdf')
+    image_path = os.path.splitext(output_path)[0] + '_sheet.jpg'
+
+    clip = VideoFileClip(clip_filename, audio=False)
+    tile_height = int(round(tile_width * clip.h / clip.w))
+    clip.close()
+    # The decoder scales the frames, so only tile sized frames are ever in memory
+    small_clip = VideoFileClip(clip_filename, audio=False, target_resolution=(tile_height, tile_width))
+    last_time = small_clip.duration - 1.0 / small_clip.fps
+
+    pdf = FPDF(orientation='P')
+    per_page = columns * rows
+    for first in range(0, len(timestamps), per_page):
+        page_times = timestamps[first:first + per_page]
+        tiles = [fit_frame(small_clip.get_frame(min(frame_time, last_time)), tile_height, tile_width)
+                 for frame_time in page_times]
+        picture = im.fromarray(compose_contact_sheet(tiles, columns))
+        burn_in_timestamps(picture, ['{}  {}'.format(first + index + 1, time.strftime('%H:%M:%S', time.gmtime(
+            frame_time))) for index, frame_time in enumerate(page_times)], tile_height, tile_width, columns)
+        picture.save(image_path, 'JPEG', quality=quality)
+        pdf.add_page()
+        pdf.image(image_path, x=10, y=10, w=190)
+        os.remove(image_path)
+    small_clip.close()
+
+    if appendix:
+        clip = VideoFileClip(clip_filename, audio=False)
+        pdf.set_font('Arial', size=12)
+        for index, frame_time in enumerate(timestamps):
+            im.fromarray(clip.get_frame(min(frame_time, last_time))).save(image_path, 'JPEG', quality=quality)
+            pdf.add_page()
+            pdf.cell(190, 10, txt='Slide {} ({})'.format(index + 1, time.strftime('%H:%M:%S', time.gmtime(
+                frame_time))), ln=1, align='L')
+            pdf.image(image_path, w=190)
+            os.remove(image_path)
+        clip.close()
+
+    pdf.output(output_path, 'F')
+    return output_path
+
+
+if __name__ == '__main__':
+    string = "/Users/stefanjp/12403/Spring Innovation Expo 2021-04-29-14-44-28.mp4"
+    times = detect_slide_changes(string, 10, 10, 20)
+    write_to_PDF(times, string)
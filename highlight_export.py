@@ -0,0 +1,165 @@
+import bisect
+import concurrent.futures
+import os
+import re
+import shutil
+import subprocess
+
+# Author: James (Jimmy) Allah-Mensah
+# Version: Python 3.7
+
+
+def get_ffmpeg_binary():
+    '''
+    Returns the ffmpeg executable: IMAGEIO_FFMPEG_EXE if set, ffmpeg on the PATH, or the one bundled with imageio
+    '''
+    if os.environ.get('IMAGEIO_FFMPEG_EXE'):
+        return os.environ['IMAGEIO_FFMPEG_EXE']
+    if shutil.which('ffmpeg'):
+        return shutil.which('ffmpeg')
+    import imageio_ffmpeg
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def parse_time(timestamp):
+    '''
+    Converts an HH:MM:SS timestamp into seconds. Anything after the timestamp, such as the heard text of a
+    sound-alike hit, is ignored
+    '''
+    match = re.match(r'\s*(\d+):(\d{2}):(\d{2})', timestamp)
+    if match is None:
+        raise ValueError('Not an HH:MM:SS timestamp: {}'.format(timestamp))
+    return int(match.group(1)) * 3600 + int(match.group(2)) * 60 + int(match.group(3))
+
+
+def parse_hit_times(hits):
+    '''
+    Flattens search hits into a sorted list of (seconds, label)
+    :param hits: Hits grouped by word or phrase then speaker, as returned by get_time_from_word or recorded by
+                 recordTimes (ex: {'cloud': {'James': ['00:01:05', '00:07:30']}})
+    '''
+    times = []
+    for word_or_phrase in hits:
+        for speaker in hits[word_or_phrase]:
+            for timestamp in hits[word_or_phrase][speaker]:
+                times.append((parse_time(timestamp), '{} ({})'.format(word_or_phrase, speaker)))
+    return sorted(times)
+
+
+def merge_ranges(times, padding_before, padding_after, merge_gap):
+    '''
+    Pads every hit and merges hits that are close to each other into a single range
+    :param times: Sorted list of (seconds, label)
+    :param padding_before: Seconds included before each hit
+    :param padding_after: Seconds included after each hit
+    :param merge_gap: Ranges separated by at most this many seconds are merged
+    :return: List of [start, end, labels] ranges
+    '''
+    return merge_close_ranges([[max(0, seconds - padding_before), seconds + padding_after, [label]]
+                               for seconds, label in times], merge_gap)
+
+
+def merge_close_ranges(ranges, merge_gap):
+    '''
+    Merges sorted [start, end, labels] ranges that overlap or are at most merge_gap seconds apart
+    '''
+    merged = []
+    for start, end, labels in ranges:
+        if len(merged) > 0 and start - merged[-1][1] <= merge_gap:
+            merged[-1][1] = max(merged[-1][1], end)
+            merged[-1][2].extend(label for label in labels if label not in merged[-1][2])
+        else:
+            merged.append([start, end, list(labels)])
+    return merged
+
+
+def snap_to_keyframes(ranges, keyframe_times):
+    '''
+    Moves the start of every range back to the keyframe at or before it. A stream copy can only start at a keyframe,
+    so snapping keeps the clips aligned with the requested times instead of starting on undecodable frames
+    :param ranges: Ranges returned by merge_ranges
+    :param keyframe_times: Sorted keyframe times in seconds
+    '''
+    if len(keyframe_times) == 0:
+        return ranges
+    for clip_range in ranges:
+        index = bisect.bisect_right(keyframe_times, clip_range[0]) - 1
+        if index >= 0:
+            clip_range[0] = keyframe_times[index]
+    return ranges
+
+
+def cut_clip(ffmpeg, source, start, end, output_path):
+    '''
+    Cuts [start, end] out of the media file without re-encoding it
+    :return: The output path
+    '''
+    subprocess.run([ffmpeg, '-y', '-hide_banner', '-loglevel', 'error', '-ss', '{:.3f}'.format(start), '-i', source,
+                    '-t', '{:.3f}'.format(end - start), '-map', '0', '-c', 'copy', '-avoid_negative_ts', 'make_zero',
+                    output_path], check=True)
+    return output_path
+
+
+def concatenate_clips(ffmpeg, clip_paths, output_path):
+    '''
+    Joins the clips into a single highlight reel without re-encoding them
+    :return: The output path
+    '''
+    list_path = output_path + '.txt'
+    with open(list_path, 'w') as file:
+        for clip_path in clip_paths:
+            file.write("file '{}'\n".format(os.path.abspath(clip_path).replace("'", "'\\''")))
+    try:
+        subprocess.run([ffmpeg, '-y', '-hide_banner', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i',
+                        list_path, '-c', 'copy', output_path], check=True)
+    finally:
+        os.remove(list_path)
+    return output_path
+
+
+def export_highlights(source, hits, output_dir, padding_before=5, padding_after=5, merge_gap=10, reel=True,
+                      workers=4):
+    '''
+    Cuts a padded clip around every search hit, merging nearby hits, using ffmpeg stream copy
+    :param source: Audio or video file the transcription was made from
+    :param hits: Hits grouped by word or phrase then speaker (see parse_hit_times)
+    :param output_dir: Directory the clips are written to
+    :param padding_before: Seconds included before each hit
+    :param padding_after: Seconds included after each hit
+    :param merge_gap: Hits whose padded ranges are at most this many seconds apart share a clip
+    :param reel: Whether to also join the clips into a single highlight reel
+    :param workers: Number of clips cut at the same time
+    :return: Paths of the clips, followed by the highlight reel if one was made
+    '''
+    ranges = merge_ranges(parse_hit_times(hits), padding_before, padding_after, merge_gap)
+    if len(ranges) == 0:
+        return []
+
+    try:
+        from condensor_video import list_keyframe_times
+        # Snapped starts can reach back into the previous clip
+        ranges = merge_close_ranges(snap_to_keyframes(ranges, list_keyframe_times(source)), merge_gap)
+    except (ImportError, subprocess.CalledProcessError):
+        # Audio only files have no video keyframes, every audio frame can start a stream copy
+        pass
+
+    ffmpeg = get_ffmpeg_binary()
+    os.makedirs(output_dir, exist_ok=True)
+    extension = os.path.splitext(source)[1]
+    print('Exporting {} highlight clips...'.format(len(ranges)))
+    clip_paths = [os.path.join(output_dir, 'highlight_{:03d}{}'.format(index + 1, extension))
+                  for index in range(len(ranges))]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(cut_clip, ffmpeg, source, clip_range[0], clip_range[1], clip_path)
+                   for clip_range, clip_path in zip(ranges, clip_paths)]
+        for future in futures:
+            future.result()
+
+    with open(os.path.join(output_dir, 'highlights.txt'), 'w') as file:
+        for clip_path, (start, end, labels) in zip(clip_paths, ranges):
+            file.write('{}\t{:.3f}\t{:.3f}\t{}\n'.format(os.path.basename(clip_path), start, end, '; '.join(labels)))
+
+    if reel and len(clip_paths) > 1:
+        clip_paths.append(concatenate_clips(ffmpeg, clip_paths,
+                                            os.path.join(output_dir, 'highlight_reel{}'.format(extension))))
+    return clip_paths
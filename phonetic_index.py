@@ -0,0 +1,255 @@
+import re
+import time
+
+# Author: James (Jimmy) Allah-Mensah
+# Version: Python 3.7
+
+VOWELS = set('AEIOUY')
+MAX_KEY_LENGTH = 6
+
+
+def double_metaphone(word):
+    '''
+    Calculates the primary and alternate phonetic keys of a word, following the main rules of the Double Metaphone
+    algorithm. Words that sound alike share a key (ex: 'cyber' and 'sighber' -> 'SPR', 'cloud' and 'clowd' -> 'KLT')
+    :param word: The word to encode
+    :return: (primary key, alternate key)
+    '''
+    word = re.sub(r'[^A-Z]', '', word.upper())
+    if len(word) == 0:
+        return '', ''
+
+    primary = []
+    alternate = []
+
+    def add(main, alt=None):
+        primary.append(main)
+        alternate.append(main if alt is None else alt)
+
+    def at(index, *options):
+        for option in options:
+            if word[index:index + len(option)] == option and index >= 0:
+                return True
+        return False
+
+    def is_vowel(index):
+        return 0 <= index < len(word) and word[index] in VOWELS
+
+    index = 0
+    if at(0, 'GN', 'KN', 'PN', 'WR', 'PS'):
+        index = 1
+    if word[0] == 'X':
+        add('S')
+        index = 1
+    elif at(0, 'WH'):
+        add('W')
+        index = 2
+
+    while index < len(word):
+        letter = word[index]
+        if letter in VOWELS:
+            if index == 0:
+                add('A')
+            index += 1
+        elif letter == 'B':
+            add('P')
+            index += 2 if at(index + 1, 'B') else 1
+        elif letter == 'C':
+            if at(index, 'CIA', 'CH'):
+                add('X', 'K')
+                index += 2 if at(index, 'CH') else 3
+            elif at(index, 'CI', 'CE', 'CY'):
+                add('S')
+                index += 2
+            elif at(index, 'CK', 'CC', 'CQ', 'CG'):
+                add('K')
+                index += 2
+            else:
+                add('K')
+                index += 1
+        elif letter == 'D':
+            if at(index, 'DGE', 'DGI', 'DGY'):
+                add('J')
+                index += 3
+            else:
+                add('T')
+                index += 2 if at(index, 'DT', 'DD') else 1
+        elif letter == 'G':
+            if at(index, 'GH'):
+                if index > 0 and not is_vowel(index - 1):
+                    add('K')
+                elif index == 0:
+                    add('K')
+                # 'GH' after a vowel is silent (ex: 'sigh', 'night')
+                index += 2
+            elif at(index, 'GN'):
+                add('N')
+                index += 2
+            elif at(index, 'GE', 'GI', 'GY'):
+                add('J', 'K')
+                index += 2
+            else:
+                add('K')
+                index += 2 if at(index + 1, 'G') else 1
+        elif letter == 'H':
+            if is_vowel(index + 1) and (index == 0 or is_vowel(index - 1)):
+                add('H')
+            index += 1
+        elif letter == 'J':
+            add('J', 'H')
+            index += 2 if at(index + 1, 'J') else 1
+        elif letter == 'P':
+            if at(index, 'PH'):
+                add('F')
+                index += 2
+            else:
+                add('P')
+                index += 2 if at(index + 1, 'P', 'B') else 1
+        elif letter == 'Q':
+            add('K')
+            index += 2 if at(index + 1, 'U') else 1
+        elif letter == 'S':
+            if at(index, 'SCH'):
+                add('SK')
+                index += 3
+            elif at(index, 'SH'):
+                add('X')
+                index += 2
+            elif at(index, 'SIO', 'SIA'):
+                add('X', 'S')
+                index += 3
+            else:
+                add('S')
+                index += 2 if at(index + 1, 'S', 'Z') else 1
+        elif letter == 'T':
+            if at(index, 'TIO', 'TIA'):
+                add('X')
+                index += 3
+            elif at(index, 'TH'):
+                add('0', 'T')
+                index += 2
+            elif at(index, 'TCH'):
+                index += 1
+            else:
+                add('T')
+                index += 2 if at(index + 1, 'T', 'D') else 1
+        elif letter == 'V':
+            add('F')
+            index += 2 if at(index + 1, 'V') else 1
+        elif letter == 'W':
+            if is_vowel(index + 1):
+                add('W')
+            index += 1
+        elif letter == 'X':
+            add('KS')
+            index += 2 if at(index + 1, 'X') else 1
+        elif letter == 'Z':
+            add('S')
+            index += 2 if at(index + 1, 'Z') else 1
+        else:
+            # F, K, L, M, N, R
+            add(letter)
+            index += 2 if at(index + 1, letter) else 1
+
+    return ''.join(primary)[:MAX_KEY_LENGTH], ''.join(alternate)[:MAX_KEY_LENGTH]
+
+
+def phonetic_keys(word):
+    '''
+    Returns the distinct, non empty phonetic keys of a word
+    '''
+    return {key for key in double_metaphone(word) if key}
+
+
+class PhoneticIndex:
+    '''
+    Hash index from the phonetic keys of every token and adjacent pair of tokens (bigram) of a transcription to the
+    positions where they were said. A word or phrase is looked up by its keys instead of scanning the transcription
+    '''
+
+    def __init__(self, transcription):
+        '''
+        :param transcription: Parsed transcription JSON
+        '''
+        self.words = []
+        self.start_times = []
+        self.confidences = []
+        self.speakers = []
+        self.keys = []
+        self.index = {}
+
+        for item in transcription['results']['items']:
+            if item['type'] == 'punctuation':
+                continue
+            self.words.append(item['alternatives'][0]['content'])
+            self.start_times.append(float(item['start_time']))
+            self.confidences.append(float(item['alternatives'][0].get('confidence', 0)))
+            self.keys.append(phonetic_keys(item['alternatives'][0]['content']))
+
+        if 'speaker_labels' in transcription['results']:
+            for segment in transcription['results']['speaker_labels']['segments']:
+                self.speakers.extend([segment['speaker_label']] * len(segment['items']))
+
+        for position, keys in enumerate(self.keys):
+            for key in keys:
+                self.index.setdefault(key, []).append(position)
+            if position + 1 < len(self.keys):
+                for key in keys:
+                    for next_key in self.keys[position + 1]:
+                        self.index.setdefault(key + ' ' + next_key, []).append(position)
+
+    def candidates(self, query_keys):
+        '''
+        Returns the positions matching the first word (or first two words) of a query
+        '''
+        positions = set()
+        if len(query_keys) == 1:
+            for key in query_keys[0]:
+                positions.update(self.index.get(key, []))
+        else:
+            for key in query_keys[0]:
+                for next_key in query_keys[1]:
+                    positions.update(self.index.get(key + ' ' + next_key, []))
+        return positions
+
+    def search(self, phrase):
+        '''
+        Finds every position where the word or phrase, or a word or phrase that sounds alike, was said
+        :param phrase: The word or phrase
+        :return: List of hits sorted by time. Each hit is a dictionary with the position, start_time, the heard text,
+                 the speaker label, the lowest confidence of the heard words and whether the hit is an exact match
+        '''
+        query_words = phrase.lower().split()
+        query_keys = [phonetic_keys(word) for word in query_words]
+        if len(query_words) == 0 or not all(query_keys):
+            return []
+
+        hits = []
+        for position in self.candidates(query_keys):
+            end = position + len(query_words)
+            if end > len(self.keys):
+                continue
+            # The first two words were matched by the index, the rest are checked one key set at a time
+            if not all(query_keys[offset] & self.keys[position + offset] for offset in range(2, len(query_words))):
+                continue
+            heard = self.words[position:end]
+            hits.append({
+                'position': position,
+                'start_time': self.start_times[position],
+                'heard': ' '.join(heard),
+                'speaker_label': self.speakers[position] if position < len(self.speakers) else None,
+                'confidence': min(self.confidences[position:end]),
+                'exact': [word.lower() for word in heard] == query_words
+            })
+        return sorted(hits, key=lambda hit: hit['position'])
+
+
+def format_hit_time(hit):
+    '''
+    Formats the time of a hit. Sound-alike hits are followed by the heard text and its confidence
+    (ex: 00:01:05 (sighber, 62%))
+    '''
+    timestamp = str(time.strftime('%H:%M:%S', time.gmtime(round(hit['start_time']))))
+    if hit['exact']:
+        return timestamp
+    return '{} ({}, {:.0%})'.format(timestamp, hit['heard'], hit['confidence'])
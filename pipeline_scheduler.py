@@ -0,0 +1,259 @@
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+
+# Author: James (Jimmy) Allah-Mensah
+# Version: Python 3.7
+
+
+class Stage:
+    '''
+    A single step of the transcription pipeline
+
+    A stage reads named artifacts (its inputs), may read configuration settings and produces one or more named
+    artifacts (its outputs). The stage is re-run only when the fingerprint of its inputs, the configuration keys it
+    reads or its version changes, or when one of the files it writes has gone missing.
+    '''
+
+    def __init__(self, name, function, inputs=(), outputs=None, config_keys=(), files=(), version=1,
+                 cacheable=True):
+        '''
+        :param name: Unique name of the stage
+        :param function: Callable receiving the input artifacts as positional arguments, in the order of inputs
+        :param inputs: Names of the artifacts the stage depends on
+        :param outputs: Names of the artifacts the stage produces (defaults to the stage name). When more than one
+                        output is given the function must return a tuple in the same order
+        :param config_keys: Configuration settings read by the stage, part of its fingerprint
+        :param files: Files written by the stage. If any are missing, the stage is re-run
+        :param version: Bump when the stage's logic changes to invalidate previously cached results
+        :param cacheable: False for stages that must always run (ex: fetching the transcription JSON)
+        '''
+        self.name = name
+        self.function = function
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs) if outputs is not None else (name,)
+        self.config_keys = tuple(config_keys)
+        self.files = tuple(files)
+        self.version = version
+        self.cacheable = cacheable
+
+
+def fingerprint(value):
+    '''
+    Calculates a stable hash of an artifact or configuration value
+    :param value: Any JSON serializable or picklable value
+    :return: Hex digest of the value
+    '''
+    try:
+        payload = json.dumps(value, sort_keys=True, default=repr).encode('utf-8')
+    except (TypeError, ValueError):
+        payload = pickle.dumps(value)
+    return hashlib.sha256(payload).hexdigest()
+
+
+class Pipeline:
+    '''
+    Runs a DAG of stages, executing independent stages concurrently and skipping stages whose fingerprint matches
+    the one recorded in the cache manifest from a previous run
+    '''
+
+    def __init__(self, stages, cache_dir, config_loader, max_workers=4):
+        '''
+        :param stages: List of Stage objects
+        :param cache_dir: Directory where the manifest and cached artifacts are stored
+        :param config_loader: Function returning the configuration value for a key (ex: getConfiguration)
+        :param max_workers: Maximum number of stages running at the same time
+        '''
+        self.stages = {}
+        self.producers = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError('Duplicate stage name: {}'.format(stage.name))
+            self.stages[stage.name] = stage
+            for output in stage.outputs:
+                if output in self.producers:
+                    raise ValueError('Artifact {} is produced by more than one stage'.format(output))
+                self.producers[output] = stage.name
+        self.cache_dir = cache_dir
+        self.config_loader = config_loader
+        self.max_workers = max_workers
+        self.manifest_path = os.path.join(cache_dir, 'manifest.json')
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.executed = []
+
+    def dependencies(self, stage):
+        '''
+        Returns the names of the stages the given stage depends on (pipeline inputs are not stages)
+        '''
+        return {self.producers[name] for name in stage.inputs if name in self.producers}
+
+    def topological_order(self):
+        '''
+        Orders the stages so that every stage comes after the stages it depends on
+        :return: List of stage names
+        '''
+        order = []
+        state = {}
+
+        def visit(name):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError('Pipeline contains a cycle through stage: {}'.format(name))
+            state[name] = 'visiting'
+            for dependency in sorted(self.dependencies(self.stages[name])):
+                visit(dependency)
+            state[name] = 'done'
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path) as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            logging.error(e)
+            return {}
+
+    def save_manifest(self, manifest):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(manifest, file, indent=2, sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
+
+    def artifact_path(self, digest):
+        return os.path.join(self.cache_dir, digest + '.pkl')
+
+    def store_artifact(self, value):
+        '''
+        Pickles an artifact into the cache directory, keyed by the hash of its content
+        :return: Content digest of the artifact
+        '''
+        payload = pickle.dumps(value)
+        digest = hashlib.sha256(payload).hexdigest()
+        path = self.artifact_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(path + '.tmp', 'wb') as file:
+                file.write(payload)
+            os.replace(path + '.tmp', path)
+        return digest
+
+    def load_artifact(self, digest):
+        with open(self.artifact_path(digest), 'rb') as file:
+            return pickle.load(file)
+
+    def stage_key(self, stage, digests):
+        '''
+        Fingerprints a stage by its version, the digests of its inputs and the configuration settings it reads
+        '''
+        config = {key: self.config_loader(key) for key in stage.config_keys}
+        return fingerprint({
+            'stage': stage.name,
+            'version': stage.version,
+            'inputs': {name: digests[name] for name in stage.inputs},
+            'config': config
+        })
+
+    def is_fresh(self, stage, key, manifest):
+        entry = manifest.get(stage.name)
+        if not stage.cacheable or entry is None or entry.get('key') != key:
+            return False
+        for path in stage.files:
+            if not os.path.exists(path):
+                return False
+        for output in stage.outputs:
+            digest = entry['outputs'].get(output)
+            if digest is None or not os.path.exists(self.artifact_path(digest)):
+                return False
+        return True
+
+    def run(self, **inputs):
+        '''
+        Runs every stale stage of the pipeline, concurrently where the DAG allows it
+        :param inputs: Values of the pipeline inputs (artifacts not produced by any stage)
+        :return: Dictionary of every artifact produced by the pipeline
+        '''
+        self.topological_order()
+        for stage in self.stages.values():
+            for name in stage.inputs:
+                if name not in self.producers and name not in inputs:
+                    raise ValueError('Stage {} requires missing input: {}'.format(stage.name, name))
+
+        manifest = self.load_manifest()
+        values = dict(inputs)
+        digests = {name: fingerprint(value) for name, value in inputs.items()}
+        self.timings = {}
+        self.executed = []
+
+        def value_of(name):
+            with self.lock:
+                if name not in values:
+                    values[name] = self.load_artifact(digests[name])
+                return values[name]
+
+        def execute(stage, key):
+            start = time.time()
+            arguments = [value_of(name) for name in stage.inputs]
+            result = stage.function(*arguments)
+            results = result if len(stage.outputs) > 1 else (result,)
+            output_digests = {}
+            for output, value in zip(stage.outputs, results):
+                output_digests[output] = self.store_artifact(value)
+                with self.lock:
+                    values[output] = value
+            self.timings[stage.name] = time.time() - start
+            return key, output_digests
+
+        pending = set(self.stages)
+        completed = set()
+        running = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for name in sorted(pending):
+                    stage = self.stages[name]
+                    if not self.dependencies(stage) <= completed:
+                        continue
+                    pending.discard(name)
+                    key = self.stage_key(stage, digests)
+                    if self.is_fresh(stage, key, manifest):
+                        for output in stage.outputs:
+                            digests[output] = manifest[name]['outputs'][output]
+                        completed.add(name)
+                        continue
+                    running[executor.submit(execute, stage, key)] = name
+
+                if not running:
+                    continue
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        key, output_digests = future.result()
+                    except Exception as e:
+                        logging.error('Stage {} failed: {}'.format(name, e))
+                        for other in running:
+                            other.cancel()
+                        self.save_manifest(manifest)
+                        raise
+                    digests.update(output_digests)
+                    manifest[name] = {'key': key, 'outputs': output_digests}
+                    completed.add(name)
+                    self.executed.append(name)
+
+        self.save_manifest(manifest)
+        for name in self.producers:
+            value_of(name)
+        return values
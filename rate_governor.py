@@ -0,0 +1,227 @@
+import logging
+import random
+import threading
+import time
+
+from botocore.exceptions import ConnectionError as EndpointError, HTTPClientError
+
+# Author: James (Jimmy) Allah-Mensah
+# Version: Python 3.7
+
+THROTTLING_ERROR_CODES = {'ThrottlingException', 'Throttling', 'TooManyRequestsException', 'RequestLimitExceeded',
+                          'SlowDown', 'RequestThrottled', 'ProvisionedThroughputExceededException',
+                          'LimitExceededException'}
+
+# Server side errors that usually succeed when the call is made again
+TRANSIENT_ERROR_CODES = {'InternalFailure', 'InternalError', 'InternalServerError', 'InternalServerException',
+                         'ServiceUnavailable', 'ServiceUnavailableException', 'RequestTimeout',
+                         'RequestTimeoutException'}
+
+DEFAULT_LIMIT = {'Rate': 5, 'MaxRate': 10, 'Burst': 5}
+
+
+def is_throttling_error(error):
+    '''
+    Checks whether an exception raised by a backend call means the call was rate limited
+    :param error: Exception raised by boto3 or the translation client
+    :return: True if the call should be retried at a lower rate
+    '''
+    # botocore errors carry the parsed response, the translation clients the HTTP response (google_trans_new as rsp)
+    response = getattr(error, 'response', None)
+    if response is None:
+        response = getattr(error, 'rsp', None)
+    if isinstance(response, dict):
+        return (response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES or
+                response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 429)
+    return getattr(response, 'status_code', None) == 429
+
+
+def is_transient_error(error):
+    '''
+    Checks whether an exception raised by a backend call is a transient failure (a server error, a dropped or timed
+    out connection) that is worth retrying at the same rate
+    :param error: Exception raised by boto3 or the translation client
+    :return: True if the call should be retried
+    '''
+    if isinstance(error, (EndpointError, HTTPClientError, ConnectionError, TimeoutError)):
+        return True
+    response = getattr(error, 'response', None)
+    if response is None:
+        response = getattr(error, 'rsp', None)
+    if isinstance(response, dict):
+        status = response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+        return response.get('Error', {}).get('Code') in TRANSIENT_ERROR_CODES or (status is not None and
+                                                                                  500 <= status < 600)
+    status = getattr(response, 'status_code', None)
+    return status is not None and 500 <= status < 600
+
+
+class TokenBucket:
+    '''
+    Token bucket with an AIMD (additive increase, multiplicative decrease) adaptive rate: every successful call
+    raises the rate a little, every throttled call cuts it in half, so the rate settles just under what the backend
+    allows. Calls throttled together are answered to the same overload, so the rate is cut at most once per cooldown
+    '''
+
+    def __init__(self, rate, max_rate, burst, min_rate=0.1, increase=1.0, decrease=0.5, cooldown=1.0):
+        '''
+        :param rate: Starting rate in calls per second
+        :param max_rate: Highest rate the bucket will increase to
+        :param burst: Number of calls that can be made back to back
+        :param min_rate: Lowest rate the bucket will decrease to
+        :param increase: Calls per second added per rate's worth of successful calls
+        :param decrease: Factor the rate is multiplied by when a call is throttled
+        :param cooldown: Seconds after a decrease during which further throttled calls do not decrease the rate
+        '''
+        self.rate = float(rate)
+        self.max_rate = float(max(max_rate, rate))
+        self.min_rate = float(min_rate)
+        self.capacity = float(burst)
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.last_decrease = None
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        '''
+        Takes a token, waiting until one is available. Tokens are reserved in arrival order, so waiting callers are
+        served first come, first served
+        :return: Seconds spent waiting
+        '''
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase / max(self.rate, 1.0))
+
+    def on_throttle(self):
+        with self.lock:
+            now = time.monotonic()
+            if self.last_decrease is None or now - self.last_decrease >= self.cooldown:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.last_decrease = now
+            # Drop the saved up burst so the callers already queued slow down too
+            self.tokens = min(self.tokens, 0.0)
+
+
+class RateGovernor:
+    '''
+    Routes every backend call through a per API token bucket, retries throttled calls and transient failures, and
+    keeps queueing metrics
+    '''
+
+    def __init__(self, limits, max_retries=6):
+        '''
+        :param limits: Dictionary of API name to {'Rate', 'MaxRate', 'Burst'}, with an optional 'default' entry used
+                       for APIs without their own limit (ex: {'transcribe.get_transcription_job': {'Rate': 10, ...}})
+        :param max_retries: Number of times a throttled or transiently failing call is retried before the error is
+                            raised
+        '''
+        self.limits = limits
+        self.max_retries = max_retries
+        self.buckets = {}
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, api_name):
+        with self.lock:
+            if api_name not in self.buckets:
+                limit = dict(DEFAULT_LIMIT)
+                limit.update(self.limits.get('default', {}))
+                limit.update(self.limits.get(api_name, {}))
+                self.buckets[api_name] = TokenBucket(limit['Rate'], limit['MaxRate'], limit['Burst'])
+                self.metrics[api_name] = {'calls': 0, 'throttles': 0, 'retries': 0, 'failures': 0,
+                                          'queue_delay': 0.0, 'max_queue_delay': 0.0}
+            return self.buckets[api_name]
+
+    def record(self, api_name, key, value=1):
+        with self.lock:
+            self.metrics[api_name][key] += value
+
+    def call(self, api_name, function, *args, **kwargs):
+        '''
+        Calls a backend function once the API's budget allows it, retrying with backoff when throttled or when it
+        fails transiently. Only throttling lowers the API's rate
+        :param api_name: Name of the budget the call counts against (ex: transcribe.start_transcription_job)
+        :param function: The backend function
+        :return: The function's return value
+        '''
+        bucket = self.bucket(api_name)
+        attempt = 0
+        while True:
+            delay = bucket.acquire()
+            with self.lock:
+                metrics = self.metrics[api_name]
+                metrics['calls'] += 1
+                metrics['queue_delay'] += delay
+                metrics['max_queue_delay'] = max(metrics['max_queue_delay'], delay)
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                if is_throttling_error(e):
+                    bucket.on_throttle()
+                    self.record(api_name, 'throttles')
+                    reason = 'was throttled'
+                elif is_transient_error(e):
+                    self.record(api_name, 'retries')
+                    reason = 'failed ({})'.format(e)
+                else:
+                    self.record(api_name, 'failures')
+                    raise
+                attempt += 1
+                if attempt > self.max_retries:
+                    self.record(api_name, 'failures')
+                    raise
+                backoff = min(10.0, 0.25 * 2 ** attempt) * random.uniform(0.5, 1.0)
+                logging.warning('{} {}, retrying in {:.1f} seconds'.format(api_name, reason, backoff))
+                time.sleep(backoff)
+                continue
+            bucket.on_success()
+            return result
+
+    def get_metrics(self):
+        '''
+        Returns the call, throttle, retry and failure counts, the total and highest queueing delay, and the current
+        rate of every API
+        '''
+        with self.lock:
+            metrics = {}
+            for api_name in self.metrics:
+                metrics[api_name] = dict(self.metrics[api_name])
+                metrics[api_name]['rate'] = self.buckets[api_name].rate
+            return metrics
+
+    def print_metrics(self):
+        for api_name, metrics in sorted(self.get_metrics().items()):
+            average_delay = metrics['queue_delay'] / metrics['calls'] if metrics['calls'] > 0 else 0.0
+            print('{}: {} calls, {} throttled, {} retried, {} failed, {:.2f}s average / {:.2f}s max queueing delay, '
+                  '{:.2f} calls/s'.format(api_name, metrics['calls'], metrics['throttles'], metrics['retries'],
+                                          metrics['failures'], average_delay, metrics['max_queue_delay'],
+                                          metrics['rate']))
+
+
+governor = None
+governor_lock = threading.Lock()
+
+
+def get_governor(config_loader):
+    '''
+    Returns the rate governor shared by every thread of the process, creating it on first use
+    :param config_loader: Function returning the configuration value for a key (ex: getConfiguration)
+    '''
+    global governor
+    with governor_lock:
+        if governor is None:
+            governor = RateGovernor(config_loader('ApiRateLimits'), config_loader('ApiMaxRetries'))
+        return governor
@@ -0,0 +1,292 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from highlight_export import get_ffmpeg_binary
+
+# Author: James (Jimmy) Allah-Mensah
+# Version: Python 3.7
+
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.03
+FRAMES_PER_CHUNK = 20000
+# Seconds of audio read from ffmpeg at a time, so long recordings are never held in memory whole
+BLOCK_SECONDS = 60
+# Frames louder than the noise floor by this many decibels may be speech
+ENERGY_MARGIN_DB = 12.0
+# Frames whose spectrum is flatter than this are noise (hiss, hum free static) rather than voiced speech
+MAX_SPECTRAL_FLATNESS = 0.5
+# Recordings whose trimmed length saves less than this fraction are uploaded untouched
+MIN_SAVING = 0.05
+
+
+def decode_audio_blocks(file_name, sample_rate=SAMPLE_RATE, block_seconds=BLOCK_SECONDS):
+    '''
+    Decodes the audio track of a media file into mono 16 bit samples, reading ffmpeg's output a block at a time
+    :param file_name: Audio or video file
+    :param sample_rate: Samples per second of the decoded audio
+    :param block_seconds: Seconds of audio per block
+    :return: Generator of int16 arrays of samples, every block but the last block_seconds long
+    '''
+    command = [get_ffmpeg_binary(), '-hide_banner', '-loglevel', 'error', '-i', file_name, '-vn', '-ac', '1',
+               '-ar', str(sample_rate), '-f', 's16le', '-']
+    process = subprocess.Popen(command, stdout=subprocess.PIPE)
+    block_bytes = int(sample_rate * block_seconds) * 2
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if len(data) < 2:
+                break
+            yield np.frombuffer(data[:len(data) // 2 * 2], dtype=np.int16)
+    finally:
+        process.stdout.close()
+        process.wait()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)
+
+
+def frame_features(samples, sample_rate=SAMPLE_RATE, frame_seconds=FRAME_SECONDS):
+    '''
+    Computes the energy and spectral flatness of every whole frame of the samples. Frames are processed a chunk at a
+    time so the spectrogram of a block is never in memory whole
+    :param samples: Decoded samples
+    :return: (energy in decibels, spectral flatness between 0 and 1) arrays, one value per frame
+    '''
+    frame_length = int(sample_rate * frame_seconds)
+    num_frames = len(samples) // frame_length
+    frames = samples[:num_frames * frame_length].reshape(num_frames, frame_length)
+    window = np.hanning(frame_length)
+    energy = np.empty(num_frames)
+    flatness = np.empty(num_frames)
+    for start in range(0, num_frames, FRAMES_PER_CHUNK):
+        chunk = frames[start:start + FRAMES_PER_CHUNK].astype(np.float64) / 32768.0
+        energy[start:start + len(chunk)] = 10.0 * np.log10(np.mean(chunk ** 2, axis=1) + 1e-10)
+        power = np.abs(np.fft.rfft(chunk * window, axis=1)) ** 2 + 1e-12
+        # Geometric over arithmetic mean of the power spectrum: 1 for white noise, close to 0 for tones and voices
+        flatness[start:start + len(chunk)] = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+    return energy, flatness
+
+
+def stream_features(blocks, sample_rate=SAMPLE_RATE, frame_seconds=FRAME_SECONDS):
+    '''
+    Computes the frame features of a recording block by block, as it is decoded. Samples left over at the end of a
+    block start the first frame of the next one
+    :param blocks: Sample blocks, see decode_audio_blocks
+    :return: (energy, flatness, number of samples), see frame_features
+    '''
+    frame_length = int(sample_rate * frame_seconds)
+    energies = []
+    flatnesses = []
+    num_samples = 0
+    leftover = np.zeros(0, dtype=np.int16)
+    for block in blocks:
+        num_samples += len(block)
+        samples = np.concatenate((leftover, block))
+        whole = len(samples) // frame_length * frame_length
+        energy, flatness = frame_features(samples[:whole], sample_rate, frame_seconds)
+        energies.append(energy)
+        flatnesses.append(flatness)
+        leftover = samples[whole:]
+    if len(energies) == 0:
+        return np.zeros(0), np.zeros(0), 0
+    return np.concatenate(energies), np.concatenate(flatnesses), num_samples
+
+
+def detect_speech(energy, flatness):
+    '''
+    Marks the frames that may contain speech. The noise floor is estimated from the quietest tenth of the recording,
+    so the threshold follows the recording level instead of a fixed volume
+    :return: Boolean array, one value per frame
+    '''
+    if len(energy) == 0:
+        return np.zeros(0, dtype=bool)
+    noise_floor = np.percentile(energy, 10)
+    return (energy > noise_floor + ENERGY_MARGIN_DB) & (flatness < MAX_SPECTRAL_FLATNESS)
+
+
+def keep_spans(speech, frame_seconds, duration, min_silence_seconds, padding_seconds):
+    '''
+    Converts the speech frames into the spans of the recording that are kept. Only non-speech stretches longer than
+    min_silence_seconds are removed, and padding_seconds of them are kept on each side so words are not clipped
+    :param speech: Boolean array returned by detect_speech
+    :param duration: Length of the recording in seconds
+    :return: List of [start, end] spans in seconds
+    '''
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], speech.astype(np.int8), [0]))))
+    speech_starts = edges[0::2] * frame_seconds
+    speech_ends = edges[1::2] * frame_seconds
+    spans = []
+    for start, end in zip(np.maximum(speech_starts - padding_seconds, 0.0),
+                          np.minimum(speech_ends + padding_seconds, duration)):
+        if len(spans) > 0 and start - spans[-1][1] < min_silence_seconds - 2 * padding_seconds:
+            spans[-1][1] = float(end)
+        else:
+            spans.append([float(start), float(end)])
+    return spans
+
+
+def build_time_map(spans):
+    '''
+    Builds the time map of the trimmed recording
+    :param spans: Kept [start, end] spans of the original recording
+    :return: List of [trimmed start, original start, length] segments
+    '''
+    time_map = []
+    trimmed_start = 0.0
+    for start, end in spans:
+        time_map.append([round(trimmed_start, 3), round(start, 3), round(end - start, 3)])
+        trimmed_start += end - start
+    return time_map
+
+
+def to_original_times(times, time_map, is_end=False):
+    '''
+    Converts times of the trimmed recording into times of the original recording
+    :param times: Trimmed times in seconds
+    :param time_map: Segments returned by build_time_map
+    :param is_end: Whether the times end an interval. A time falling exactly on a cut belongs to the segment before the
+                   cut when it ends an interval and to the segment after it otherwise
+    :return: Array of original times
+    '''
+    segments = np.asarray(time_map, dtype=np.float64).reshape(-1, 3)
+    times = np.asarray(times, dtype=np.float64)
+    if len(segments) == 0:
+        return times
+    index = np.searchsorted(segments[:, 0], times, side='left' if is_end else 'right') - 1
+    index = np.clip(index, 0, len(segments) - 1)
+    return segments[index, 1] + times - segments[index, 0]
+
+
+def remap_transcription(transcription, time_map):
+    '''
+    Rewrites every start_time and end_time of the transcription JSON from trimmed time back to original media time,
+    so the formatted transcription, search hits and PDFs show the times of the original recording
+    :param transcription: Parsed transcription JSON, modified in place
+    :param time_map: Segments returned by build_time_map
+    :return: The transcription
+    '''
+    fields = {'start_time': [], 'end_time': []}
+
+    def collect(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key in fields and isinstance(value, str):
+                    fields[key].append(node)
+                else:
+                    collect(value)
+        elif isinstance(node, list):
+            for value in node:
+                collect(value)
+
+    collect(transcription)
+    for key, nodes in fields.items():
+        if len(nodes) == 0:
+            continue
+        times = to_original_times([float(node[key]) for node in nodes], time_map, is_end=(key == 'end_time'))
+        for node, original_time in zip(nodes, times):
+            node[key] = '{:.3f}'.format(original_time)
+    return transcription
+
+
+def write_trimmed_audio(file_name, spans, output_path, sample_rate=SAMPLE_RATE):
+    '''
+    Decodes the recording again, a block at a time, and pipes the kept spans into an ffmpeg encoder writing
+    output_path, in the format given by its extension
+    :param spans: Kept [start, end] spans in seconds, sorted
+    '''
+    command = [get_ffmpeg_binary(), '-y', '-hide_banner', '-loglevel', 'error', '-f', 's16le', '-ar',
+               str(sample_rate), '-ac', '1', '-i', '-', output_path]
+    encoder = subprocess.Popen(command, stdin=subprocess.PIPE)
+    sample_spans = [(int(start * sample_rate), int(end * sample_rate)) for start, end in spans]
+    span_index = 0
+    position = 0
+    try:
+        for block in decode_audio_blocks(file_name, sample_rate):
+            block_end = position + len(block)
+            while span_index < len(sample_spans) and sample_spans[span_index][0] < block_end:
+                start, end = sample_spans[span_index]
+                encoder.stdin.write(block[max(start, position) - position:min(end, block_end) - position].tobytes())
+                if end > block_end:
+                    break
+                span_index += 1
+            position = block_end
+    finally:
+        encoder.stdin.close()
+        encoder.wait()
+    if encoder.returncode != 0:
+        raise subprocess.CalledProcessError(encoder.returncode, command)
+    return output_path
+
+
+def time_map_path(trimmed_path):
+    return os.path.splitext(trimmed_path)[0] + '.timemap.json'
+
+
+def write_time_map(time_map, source, trimmed_path):
+    with open(time_map_path(trimmed_path), 'w') as file:
+        json.dump({'source': source, 'segments': time_map}, file)
+
+
+def load_time_map(trimmed_path):
+    '''
+    Loads the time map written next to a trimmed recording
+    :return: The time map segments, or None if the recording was not trimmed
+    '''
+    if not os.path.exists(time_map_path(trimmed_path)):
+        return None
+    with open(time_map_path(trimmed_path)) as file:
+        return json.load(file)['segments']
+
+
+def trim_silence(file_name, output_dir, min_silence_seconds=2.0, padding_seconds=0.5):
+    '''
+    Removes the long non-speech stretches of a recording before it is uploaded
+    :param file_name: Audio or video file
+    :param output_dir: Directory the trimmed recording and its time map are written to
+    :param min_silence_seconds: Shortest non-speech stretch that is removed
+    :param padding_seconds: Seconds kept on each side of every removed stretch
+    :return: (path of the file to upload, time map), the original file and None if trimming would not save enough
+    '''
+    try:
+        energy, flatness, num_samples = stream_features(decode_audio_blocks(file_name))
+    except subprocess.CalledProcessError as e:
+        logging.error(e)
+        return file_name, None
+    duration = num_samples / SAMPLE_RATE
+    spans = keep_spans(detect_speech(energy, flatness), FRAME_SECONDS, duration, min_silence_seconds,
+                       padding_seconds)
+    kept = sum(end - start for start, end in spans)
+    if len(spans) == 0 or kept > duration * (1 - MIN_SAVING):
+        return file_name, None
+
+    os.makedirs(output_dir, exist_ok=True)
+    trimmed_path = os.path.join(output_dir, os.path.basename(file_name))
+    write_trimmed_audio(file_name, spans, trimmed_path)
+    time_map = build_time_map(spans)
+    write_time_map(time_map, file_name, trimmed_path)
+    print('Trimmed {:.0f} of {:.0f} seconds of silence ({} spans kept)'.format(duration - kept, duration, len(spans)))
+    return trimmed_path, time_map
+
+
+def main():
+    '''
+    Writes the trimmed recording and its time map
+    Usage: python silence_trimming.py MEDIA_FILE [OUTPUT_DIR]
+    '''
+    if len(sys.argv) < 2:
+        print(main.__doc__)
+        return
+    output_dir = sys.argv[2] if len(sys.argv) > 2 else 'Trimmed'
+    trimmed_path, time_map = trim_silence(sys.argv[1], output_dir)
+    if time_map is None:
+        print('Nothing worth trimming in {}'.format(sys.argv[1]))
+    else:
+        print('Wrote {} and {}'.format(trimmed_path, time_map_path(trimmed_path)))
+
+
+if __name__ == '__main__':
+    main()
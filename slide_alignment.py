@@ -0,0 +1,209 @@
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Author: James (Jimmy) Allah-Mensah
+# Version: Python 3.7
+
+
+class IntervalIndex:
+    '''
+    Sorted-array interval tree. The intervals are sorted by start time and the running maximum of their end times is
+    kept next to them; both arrays are sorted, so the intervals overlapping a query are found with two binary
+    searches, O(log n + k) per query, and many queries are answered at once with np.searchsorted
+    '''
+
+    def __init__(self, starts, ends):
+        '''
+        :param starts: Start times of the intervals
+        :param ends: End times of the intervals
+        '''
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+        self.order = np.argsort(starts, kind='stable')
+        self.starts = starts[self.order]
+        self.ends = ends[self.order]
+        self.max_ends = np.maximum.accumulate(self.ends) if len(self.ends) > 0 else self.ends
+
+    def candidate_ranges(self, query_starts, query_ends):
+        '''
+        Returns, for every query, the range of sorted intervals that may overlap it: intervals before the range end
+        before the query starts, and intervals after it start after the query ends
+        '''
+        low = np.searchsorted(self.max_ends, np.asarray(query_starts, dtype=np.float64), side='right')
+        high = np.searchsorted(self.starts, np.asarray(query_ends, dtype=np.float64), side='left')
+        return low, np.maximum(low, high)
+
+    def overlapping(self, query_starts, query_ends):
+        '''
+        Finds the intervals overlapping each query interval [start, end)
+        :return: List with, per query, the original indexes of the overlapping intervals in start time order
+        '''
+        low, high = self.candidate_ranges(query_starts, query_ends)
+        results = []
+        for query_start, first, last in zip(np.asarray(query_starts, dtype=np.float64), low, high):
+            candidates = np.arange(first, last)
+            # Only nested (overlapping) intervals can end before the query starts, the range is exact otherwise
+            candidates = candidates[self.ends[candidates] > query_start]
+            results.append(self.order[candidates])
+        return results
+
+
+def load_transcription_words(transcription):
+    '''
+    Loads the words of the transcription, with punctuation attached to the preceding word
+    :param transcription: Parsed transcription JSON
+    :return: (start times, end times, speaker labels, words) arrays of the pronunciation items
+    '''
+    words = []
+    starts = []
+    ends = []
+    for item in transcription['results']['items']:
+        content = item['alternatives'][0]['content']
+        if item['type'] == 'punctuation':
+            if len(words) > 0:
+                words[-1] += content
+            continue
+        words.append(content)
+        starts.append(float(item['start_time']))
+        ends.append(float(item['end_time']))
+
+    speakers = []
+    for segment in transcription['results']['speaker_labels']['segments']:
+        label = segment['speaker_label']
+        speakers.extend(['Speaker {}'.format(int(label.split('_')[1]) + 1)] * len(segment['items']))
+    speakers = (speakers + [''] * len(words))[:len(words)]
+    return np.array(starts), np.array(ends), np.array(speakers, dtype=object), np.array(words, dtype=object)
+
+
+def slide_spans(timestamps, duration):
+    '''
+    Converts the slide change times into the span each slide was shown. The opening slide, shown before the first
+    change, is included
+    :param timestamps: Seconds at which the slides change
+    :param duration: Length of the video in seconds
+    :return: (start times, end times) of the slides
+    '''
+    starts = [0.0] + [float(timestamp) for timestamp in timestamps if timestamp > 0]
+    ends = starts[1:] + [max(float(duration), starts[-1])]
+    return np.array(starts), np.array(ends)
+
+
+def align_slides(timestamps, transcription, duration):
+    '''
+    Attaches to every slide the speech said while it was shown
+    :param timestamps: Seconds at which the slides change (ex: from condensor_video.detect_slide_changes)
+    :param transcription: Parsed transcription JSON
+    :param duration: Length of the video in seconds
+    :return: List of slides, each a dictionary with the start, end and the speaker turns (speaker, start, end, text)
+             said while it was shown
+    '''
+    slide_starts, slide_ends = slide_spans(timestamps, duration)
+    word_starts, word_ends, word_speakers, words = load_transcription_words(transcription)
+    segments = transcription['results']['speaker_labels']['segments']
+    segment_index = IntervalIndex([float(segment['start_time']) for segment in segments],
+                                  [float(segment['end_time']) for segment in segments])
+    word_index = IntervalIndex(word_starts, word_ends)
+
+    # A word belongs to the slide shown when it started, so a segment running over a slide change is split there
+    first_words = np.searchsorted(word_index.starts, slide_starts, side='left')
+    last_words = np.searchsorted(word_index.starts, slide_ends, side='left')
+    last_words[-1] = len(word_index.starts)
+    overlapping_segments = segment_index.overlapping(slide_starts, slide_ends)
+
+    slides = []
+    for slide, (first, last) in enumerate(zip(first_words, last_words)):
+        positions = word_index.order[first:last]
+        turns = []
+        for position in positions:
+            if len(turns) == 0 or turns[-1][0] != word_speakers[position]:
+                turns.append([word_speakers[position], word_starts[position], word_ends[position], []])
+            turns[-1][2] = word_ends[position]
+            turns[-1][3].append(words[position])
+        slides.append({
+            'start': float(slide_starts[slide]),
+            'end': float(slide_ends[slide]),
+            'segments': [int(index) for index in overlapping_segments[slide]],
+            'turns': [(speaker, float(start), float(end), ' '.join(text)) for speaker, start, end, text in turns]
+        })
+    return slides
+
+
+def format_time(seconds):
+    return str(time.strftime('%H:%M:%S', time.gmtime(round(seconds))))
+
+
+def pdf_text(text):
+    # The built in PDF fonts only support latin-1
+    return text.encode('latin-1', 'replace').decode('latin-1')
+
+
+def write_combined_PDF(slides, clip_filename, output_path, speaker_dict=None):
+    '''
+    Writes a document where every slide is followed by the transcription said while it was shown
+    :param slides: Slides returned by align_slides
+    :param clip_filename: Video file path
+    :param output_path: Output PDF path
+    :param speaker_dict: Identified or defaulted speaker names (ex: {'Speaker 1': 'James'})
+    '''
+    from fpdf import FPDF
+    from PIL import Image as im
+    from moviepy.editor import VideoFileClip
+
+    speaker_dict = speaker_dict or {}
+    clip = VideoFileClip(clip_filename, audio=False)
+    pdf = FPDF(orientation='P')
+    image_path = os.path.splitext(output_path)[0] + '_slide.png'
+    for slide in slides:
+        pdf.add_page()
+        picture = im.fromarray(clip.get_frame(min(slide['start'], clip.duration - 1.0 / clip.fps)))
+        picture.thumbnail((picture.size[0] // 2, picture.size[1] // 2))
+        picture.save(image_path, 'PNG')
+        pdf.image(image_path, w=190)
+        os.remove(image_path)
+
+        pdf.set_font("Arial", 'B', size=12)
+        pdf.cell(190, 10, txt='Slide shown {} - {}'.format(format_time(slide['start']), format_time(slide['end'])),
+                 ln=1, align='L')
+        for speaker, start, end, text in slide['turns']:
+            speaker = speaker_dict.get(speaker, speaker)
+            pdf.set_font("Helvetica", 'B', size=11)
+            pdf.cell(190, 8, txt=pdf_text('{} [{} - {}]:'.format(speaker, format_time(start), format_time(end))),
+                     ln=1, align='L')
+            pdf.set_font("Helvetica", size=11)
+            pdf.multi_cell(190, 6, txt=pdf_text(text), align='L')
+    pdf.output(output_path, 'F')
+    clip.close()
+
+
+def main():
+    '''
+    Writes the combined slide and transcription document of a video
+    Usage: python slide_alignment.py VIDEO TRANSCRIPTION.json [OUTPUT.pdf] [MODE]
+    '''
+    if len(sys.argv) < 3:
+        print(main.__doc__)
+        return
+    import condensor_video
+    from moviepy.editor import VideoFileClip
+
+    video = sys.argv[1]
+    with open(sys.argv[2]) as file:
+        transcription = json.load(file)
+    output_path = sys.argv[3] if len(sys.argv) > 3 else os.path.splitext(video)[0] + ' Slides And Transcript.pdf'
+    mode = sys.argv[4] if len(sys.argv) > 4 else 'dense'
+
+    timestamps = condensor_video.detect_slide_changes(video, 10, 10, 20, mode)
+    clip = VideoFileClip(video, audio=False)
+    duration = clip.duration
+    clip.close()
+    slides = align_slides(timestamps, transcription, duration)
+    write_combined_PDF(slides, video, output_path)
+    print('Wrote {} slides to {}'.format(len(slides), output_path))
+
+
+if __name__ == '__main__':
+    main()
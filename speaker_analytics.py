@@ -0,0 +1,341 @@
+import csv
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Author: James (Jimmy) Allah-Mensah
+# Version: Python 3.7
+
+STATISTIC_FIELDS = ['talk_time', 'talk_share', 'words', 'words_per_minute', 'turns', 'watch_word_hits',
+                    'watch_words_per_1000']
+
+
+def speaker_label(speaker_id):
+    '''
+    Converts a zero based speaker id into the label used in the formatted transcription (ex: 0 -> Speaker 1)
+    '''
+    return 'Speaker {}'.format(speaker_id + 1)
+
+
+def load_segment_arrays(transcription):
+    '''
+    Loads the speaker segments and items of the transcription JSON into NumPy arrays
+    :param transcription: Parsed transcription JSON
+    :return: Dictionary of arrays. Segment level: segment_start, segment_end, segment_speaker, segment_tokens.
+             Item level: item_start, item_end, item_speaker, item_content
+    '''
+    segments = transcription['results']['speaker_labels']['segments']
+    segment_start = np.array([float(segment['start_time']) for segment in segments], dtype=np.float64)
+    segment_end = np.array([float(segment['end_time']) for segment in segments], dtype=np.float64)
+    segment_speaker = np.array([int(segment['speaker_label'].split('_')[1]) for segment in segments],
+                               dtype=np.int64)
+    segment_tokens = np.array([len(segment['items']) for segment in segments], dtype=np.int64)
+
+    item_start = np.array([float(item['start_time']) for segment in segments for item in segment['items']],
+                          dtype=np.float64)
+    item_end = np.array([float(item['end_time']) for segment in segments for item in segment['items']],
+                        dtype=np.float64)
+    item_speaker = np.repeat(segment_speaker, segment_tokens)
+
+    contents = [item['alternatives'][0]['content'].lower() for item in transcription['results']['items']
+                if item['type'] != 'punctuation']
+    item_content = np.array(contents[:len(item_start)] + [''] * (len(item_start) - len(contents)), dtype=object)
+
+    return {
+        'segment_start': segment_start,
+        'segment_end': segment_end,
+        'segment_speaker': segment_speaker,
+        'segment_tokens': segment_tokens,
+        'item_start': item_start,
+        'item_end': item_end,
+        'item_speaker': item_speaker,
+        'item_content': item_content
+    }
+
+
+def watch_word_mask(item_content, watch_words):
+    '''
+    Marks every item where a watch word or watch phrase starts
+    :param item_content: Lower case item contents
+    :param watch_words: Watch words loaded from the configuration file
+    :return: Integer array with the number of watch words starting at each item
+    '''
+    hits = np.zeros(len(item_content), dtype=np.int64)
+    for watch_word in watch_words:
+        words = watch_word.lower().split()
+        if len(words) == 0 or len(words) > len(item_content):
+            continue
+        length = len(item_content) - len(words) + 1
+        mask = np.ones(length, dtype=bool)
+        for offset, word in enumerate(words):
+            mask &= item_content[offset:offset + length] == word
+        hits[:length] += mask
+    return hits
+
+
+def compute_speaker_statistics(arrays, watch_words, num_speakers=None):
+    '''
+    Computes talk time, words per minute, turn counts and watch word density per speaker
+    :param arrays: Segment arrays returned by load_segment_arrays
+    :param watch_words: Watch words loaded from the configuration file
+    :param num_speakers: Number of speakers (defaults to the highest speaker id + 1)
+    :return: Dictionary of per speaker arrays, indexed by speaker id
+    '''
+    segment_speaker = arrays['segment_speaker']
+    if num_speakers is None:
+        num_speakers = int(segment_speaker.max()) + 1 if len(segment_speaker) > 0 else 0
+
+    talk_time = np.bincount(segment_speaker, weights=arrays['segment_end'] - arrays['segment_start'],
+                            minlength=num_speakers)
+    words = np.bincount(segment_speaker, weights=arrays['segment_tokens'], minlength=num_speakers)
+    turn_starts = np.ones(len(segment_speaker), dtype=bool)
+    turn_starts[1:] = segment_speaker[1:] != segment_speaker[:-1]
+    turns = np.bincount(segment_speaker[turn_starts], minlength=num_speakers)
+    watch_word_hits = np.bincount(arrays['item_speaker'], weights=watch_word_mask(arrays['item_content'],
+                                                                                  watch_words),
+                                  minlength=num_speakers)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        words_per_minute = np.where(talk_time > 0, words / (talk_time / 60), 0.0)
+        watch_words_per_1000 = np.where(words > 0, watch_word_hits * 1000 / words, 0.0)
+    total_talk_time = talk_time.sum()
+    talk_share = talk_time / total_talk_time if total_talk_time > 0 else np.zeros(num_speakers)
+
+    return {
+        'talk_time': talk_time,
+        'talk_share': talk_share,
+        'words': words,
+        'words_per_minute': words_per_minute,
+        'turns': turns,
+        'watch_word_hits': watch_word_hits,
+        'watch_words_per_1000': watch_words_per_1000
+    }
+
+
+def compute_time_bucket_statistics(arrays, bucket_seconds, num_speakers=None):
+    '''
+    Computes the talk time and words of each speaker in fixed size time buckets
+    :param arrays: Segment arrays returned by load_segment_arrays
+    :param bucket_seconds: Length of each time bucket in seconds
+    :param num_speakers: Number of speakers (defaults to the highest speaker id + 1)
+    :return: Dictionary with the bucket start times and (buckets x speakers) talk time and word count matrices
+    '''
+    item_speaker = arrays['item_speaker']
+    if num_speakers is None:
+        num_speakers = int(item_speaker.max()) + 1 if len(item_speaker) > 0 else 0
+    if len(item_speaker) == 0:
+        return {'bucket_start': np.zeros(0), 'talk_time': np.zeros((0, num_speakers)),
+                'words': np.zeros((0, num_speakers), dtype=np.int64)}
+
+    bucket = (arrays['item_start'] // bucket_seconds).astype(np.int64)
+    num_buckets = int(bucket.max()) + 1
+    cell = bucket * num_speakers + item_speaker
+    talk_time = np.bincount(cell, weights=arrays['item_end'] - arrays['item_start'],
+                            minlength=num_buckets * num_speakers).reshape(num_buckets, num_speakers)
+    words = np.bincount(cell, minlength=num_buckets * num_speakers).reshape(num_buckets, num_speakers)
+    return {
+        'bucket_start': np.arange(num_buckets) * bucket_seconds,
+        'talk_time': talk_time,
+        'words': words
+    }
+
+
+def analyze_transcription(transcription, watch_words, bucket_seconds):
+    '''
+    Computes the per speaker and per time bucket statistics of a single transcription
+    :param transcription: Parsed transcription JSON
+    :param watch_words: Watch words loaded from the configuration file
+    :param bucket_seconds: Length of each time bucket in seconds
+    :return: Dictionary with the 'speakers' rows and 'buckets' rows of the statistics
+    '''
+    arrays = load_segment_arrays(transcription)
+    speaker_statistics = compute_speaker_statistics(arrays, watch_words)
+    num_speakers = len(speaker_statistics['talk_time'])
+    bucket_statistics = compute_time_bucket_statistics(arrays, bucket_seconds, num_speakers)
+
+    speakers = []
+    for speaker_id in range(num_speakers):
+        row = {'speaker': speaker_label(speaker_id)}
+        for field in STATISTIC_FIELDS:
+            row[field] = speaker_statistics[field][speaker_id].item()
+        speakers.append(row)
+
+    buckets = []
+    for bucket_index, bucket_start in enumerate(bucket_statistics['bucket_start']):
+        for speaker_id in range(num_speakers):
+            buckets.append({
+                'bucket_start': time.strftime('%H:%M:%S', time.gmtime(int(bucket_start))),
+                'speaker': speaker_label(speaker_id),
+                'talk_time': bucket_statistics['talk_time'][bucket_index, speaker_id].item(),
+                'words': bucket_statistics['words'][bucket_index, speaker_id].item()
+            })
+    return {'speakers': speakers, 'buckets': buckets}
+
+
+def analyze_batch(transcriptions, watch_words):
+    '''
+    Computes the per speaker statistics of many transcriptions at once. The segments of every transcription are
+    concatenated and grouped by (transcription, speaker), so the cost is a handful of array operations regardless of
+    the number of transcriptions
+    :param transcriptions: Dictionary of job name to parsed transcription JSON
+    :param watch_words: Watch words loaded from the configuration file
+    :return: List of rows, one per speaker per transcription
+    '''
+    job_names = list(transcriptions)
+    if len(job_names) == 0:
+        return []
+    loaded = [load_segment_arrays(transcriptions[job_name]) for job_name in job_names]
+    max_speakers = max([int(arrays['segment_speaker'].max()) + 1 for arrays in loaded
+                        if len(arrays['segment_speaker']) > 0] + [1])
+
+    combined = {}
+    for key in ['segment_start', 'segment_end', 'segment_tokens', 'item_content']:
+        combined[key] = np.concatenate([arrays[key] for arrays in loaded]) if loaded else np.zeros(0)
+    # Offsetting the speaker ids by transcription keeps each (transcription, speaker) pair in its own group, and
+    # starting a new transcription always counts as a new turn since the group changes
+    combined['segment_speaker'] = np.concatenate(
+        [arrays['segment_speaker'] + index * max_speakers for index, arrays in enumerate(loaded)]).astype(np.int64)
+    combined['item_speaker'] = np.concatenate(
+        [arrays['item_speaker'] + index * max_speakers for index, arrays in enumerate(loaded)]).astype(np.int64)
+    if len(combined['item_content']) > 0:
+        # Phrases must not match across the boundary of two transcriptions
+        boundaries = np.cumsum([len(arrays['item_content']) for arrays in loaded])[:-1]
+        combined['item_content'] = np.insert(combined['item_content'], boundaries, '')
+        combined['item_speaker'] = np.insert(combined['item_speaker'], boundaries, 0)
+
+    statistics = compute_speaker_statistics(combined, watch_words, len(job_names) * max_speakers)
+    rows = []
+    for group in np.flatnonzero(statistics['words'] + statistics['talk_time'] > 0):
+        row = {'job_name': job_names[group // max_speakers], 'speaker': speaker_label(int(group % max_speakers))}
+        for field in STATISTIC_FIELDS:
+            row[field] = statistics[field][group].item()
+        rows.append(row)
+
+    # Talk share is relative to each transcription, not to the whole batch
+    job_talk_time = {}
+    for row in rows:
+        job_talk_time[row['job_name']] = job_talk_time.get(row['job_name'], 0) + row['talk_time']
+    for row in rows:
+        total = job_talk_time[row['job_name']]
+        row['talk_share'] = row['talk_time'] / total if total > 0 else 0.0
+    return rows
+
+
+def write_analytics_csv(rows, path):
+    '''
+    Writes the statistic rows to a CSV file
+    :param rows: List of dictionaries with the same keys
+    :param path: Output file path
+    '''
+    with open(path, 'w', newline='') as file:
+        if len(rows) == 0:
+            return
+        writer = csv.DictWriter(file, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_analytics_json(analytics, path):
+    '''
+    Writes the statistics to a JSON file
+    :param analytics: Statistics returned by analyze_transcription or analyze_batch
+    :param path: Output file path
+    '''
+    with open(path, 'w') as file:
+        json.dump(analytics, file, indent=2)
+
+
+def analytics_file_names(job_name):
+    '''
+    Returns the JSON, speaker CSV and time bucket CSV file names of a transcription job
+    :param job_name: Name of transcription job
+    '''
+    base_name = '{} Analytics'.format(job_name.replace('_', ' ')).title()
+    return [base_name + '.json', base_name + ' Speakers.csv', base_name + ' Buckets.csv']
+
+
+def write_transcription_analytics(analytics, job_name):
+    '''
+    Writes the statistics of a single transcription to the speaker and time bucket CSV files and a JSON file
+    :param analytics: Statistics returned by analyze_transcription
+    :param job_name: Name of transcription job
+    :return: The file names that were written
+    '''
+    paths = analytics_file_names(job_name)
+    write_analytics_json(analytics, paths[0])
+    write_analytics_csv(analytics['speakers'], paths[1])
+    write_analytics_csv(analytics['buckets'], paths[2])
+    return paths
+
+
+def speaker_summary(analytics):
+    '''
+    Returns the per speaker statistics shown in the transcription PDF. Watch word counts are left out so that editing
+    the watch words does not change the summary, and the transcription PDF is not re-rendered
+    :param analytics: Statistics returned by analyze_transcription
+    '''
+    summary_fields = ['speaker', 'talk_time', 'talk_share', 'words', 'words_per_minute', 'turns']
+    return {'speakers': [{field: row[field] for field in summary_fields} for row in analytics['speakers']]}
+
+
+def add_analytics_page(pdf, analytics, speaker_dict):
+    '''
+    Adds a speaker summary page to the transcription PDF
+    :param pdf: FPDF document
+    :param analytics: Statistics returned by speaker_summary or analyze_transcription
+    :param speaker_dict: Identified or defaulted speaker names
+    '''
+    pdf.add_page()
+    pdf.set_font("Arial", size=20)
+    pdf.cell(200, 10, txt='Speaker Summary', ln=1, align='C')
+    pdf.cell(200, 10, txt='', ln=1, align='L')
+
+    columns = [('Speaker', 60), ('Talk Time', 30), ('Share', 25), ('Words', 25), ('WPM', 25), ('Turns', 25)]
+    pdf.set_font("Helvetica", 'B', size=11)
+    for title, width in columns:
+        pdf.cell(width, 10, txt=title, border=1, align='C')
+    pdf.ln()
+
+    pdf.set_font("Helvetica", size=11)
+    for row in analytics['speakers']:
+        if row['words'] == 0 and row['talk_time'] == 0:
+            continue
+        values = [speaker_dict.get(row['speaker'], row['speaker']),
+                  time.strftime('%H:%M:%S', time.gmtime(round(row['talk_time']))),
+                  '{:.0%}'.format(row['talk_share']),
+                  str(int(row['words'])),
+                  '{:.0f}'.format(row['words_per_minute']),
+                  str(int(row['turns']))]
+        for (title, width), value in zip(columns, values):
+            pdf.cell(width, 10, txt=value, border=1, align='C')
+        pdf.ln()
+
+
+def main():
+    '''
+    Weekly roll-up: computes the speaker statistics of every transcription JSON passed on the command line
+    Usage: python speaker_analytics.py OUTPUT_PREFIX TRANSCRIPTION.json [TRANSCRIPTION.json ...]
+    '''
+    if len(sys.argv) < 3:
+        print(main.__doc__)
+        return
+    with open('transcription_config.json') as file:
+        watch_words = json.load(file)['WatchWords']
+
+    transcriptions = {}
+    for path in sys.argv[2:]:
+        with open(path) as file:
+            transcriptions[os.path.splitext(os.path.basename(path))[0]] = json.load(file)
+
+    start = time.time()
+    rows = analyze_batch(transcriptions, watch_words)
+    write_analytics_csv(rows, sys.argv[1] + '.csv')
+    write_analytics_json(rows, sys.argv[1] + '.json')
+    print('Analyzed {} transcriptions in {:.2f} seconds.'.format(len(transcriptions), time.time() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,482 @@
+import abc
+import asyncio
+import collections
+import json
+import queue
+import re
+import subprocess
+import sys
+import threading
+import time
+
+from highlight_export import get_ffmpeg_binary
+
+# Author: James (Jimmy) Allah-Mensah
+# Version: Python 3.7
+
+SAMPLE_RATE = 16000
+CHUNK_SECONDS = 0.1
+
+
+def format_time(seconds):
+    return str(time.strftime('%H:%M:%S', time.gmtime(round(seconds))))
+
+
+def speaker_name(speaker):
+    '''
+    Converts a streaming speaker label ('0', 'spk_0') into the name used by the formatted transcription (Speaker 1)
+    '''
+    if speaker is None:
+        return 'Speaker 1'
+    return 'Speaker {}'.format(int(str(speaker).replace('spk_', '')) + 1)
+
+
+def normalize_word(word):
+    return re.sub(r"[^\w']", '', word.lower())
+
+
+def audio_chunks(file_name, chunk_seconds=CHUNK_SECONDS, sample_rate=SAMPLE_RATE, realtime=False):
+    '''
+    Decodes the audio track of a media file into 16 bit mono PCM chunks, a chunk at a time, so only one chunk is in
+    memory however long the recording is
+    :param file_name: Audio or video file
+    :param chunk_seconds: Length of each chunk
+    :param realtime: Whether chunks are produced at the speed the audio plays, like a live microphone
+    :return: Generator of PCM byte strings
+    '''
+    chunk_size = int(sample_rate * chunk_seconds) * 2
+    process = subprocess.Popen([get_ffmpeg_binary(), '-hide_banner', '-loglevel', 'error', '-i', file_name, '-vn',
+                                '-ac', '1', '-ar', str(sample_rate), '-f', 's16le', '-'], stdout=subprocess.PIPE)
+    started = time.monotonic()
+    sent = 0.0
+    try:
+        while True:
+            chunk = process.stdout.read(chunk_size)
+            if len(chunk) == 0:
+                break
+            if realtime:
+                time.sleep(max(0.0, sent - (time.monotonic() - started)))
+            sent += len(chunk) / 2.0 / sample_rate
+            yield chunk
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+
+
+class StreamingBackend(abc.ABC):
+    '''
+    Streaming transcription backend. A backend consumes audio chunks and yields results as they are recognized; each
+    result is a dictionary with the result_id, is_partial, start_time, end_time and items. A result is repeated with
+    the same result_id, growing, while it is partial, and its last version has is_partial set to False. Each item is
+    a dictionary with the content, type ('pronunciation' or 'punctuation'), start_time, end_time, speaker and
+    confidence
+    '''
+
+    @abc.abstractmethod
+    def results(self, chunks):
+        '''
+        :param chunks: Iterable of 16 bit mono PCM audio chunks, see audio_chunks
+        :return: Generator of results
+        '''
+
+
+class TranscribeStreamingBackend(StreamingBackend):
+    '''
+    AWS Transcribe streaming backend, using the amazon-transcribe package. The SDK is asynchronous, so it runs in its
+    own event loop thread and hands results over through a bounded queue
+    '''
+
+    def __init__(self, region, language_code='en-US', sample_rate=SAMPLE_RATE, queue_size=100):
+        self.region = region
+        self.language_code = language_code
+        self.sample_rate = sample_rate
+        self.queue_size = queue_size
+
+    def results(self, chunks):
+        from amazon_transcribe.client import TranscribeStreamingClient
+        from amazon_transcribe.model import TranscriptEvent
+
+        results = queue.Queue(maxsize=self.queue_size)
+        done = object()
+
+        async def stream_audio(stream):
+            loop = asyncio.get_event_loop()
+            iterator = iter(chunks)
+            while True:
+                # The chunk generator may block (ex: a live source), it is read outside of the event loop
+                chunk = await loop.run_in_executor(None, next, iterator, None)
+                if chunk is None:
+                    break
+                await stream.input_stream.send_audio_event(audio_chunk=chunk)
+            await stream.input_stream.end_stream()
+
+        async def read_results(stream):
+            async for event in stream.output_stream:
+                if not isinstance(event, TranscriptEvent):
+                    continue
+                for result in event.transcript.results:
+                    if len(result.alternatives) == 0:
+                        continue
+                    results.put({
+                        'result_id': result.result_id,
+                        'is_partial': result.is_partial,
+                        'start_time': result.start_time,
+                        'end_time': result.end_time,
+                        'items': [{'content': item.content, 'type': item.item_type, 'start_time': item.start_time,
+                                   'end_time': item.end_time, 'speaker': getattr(item, 'speaker', None),
+                                   'confidence': getattr(item, 'confidence', None)}
+                                  for item in result.alternatives[0].items]
+                    })
+
+        async def run():
+            client = TranscribeStreamingClient(region=self.region)
+            stream = await client.start_stream_transcription(language_code=self.language_code,
+                                                             media_sample_rate_hz=self.sample_rate,
+                                                             media_encoding='pcm', show_speaker_label=True)
+            await asyncio.gather(stream_audio(stream), read_results(stream))
+
+        def worker():
+            try:
+                asyncio.new_event_loop().run_until_complete(run())
+            except Exception as e:
+                results.put(e)
+            finally:
+                results.put(done)
+
+        threading.Thread(target=worker, daemon=True).start()
+        while True:
+            result = results.get()
+            if result is done:
+                return
+            if isinstance(result, Exception):
+                raise result
+            yield result
+
+
+class ReplayBackend(StreamingBackend):
+    '''
+    Local stand-in for a streaming backend: replays a batch transcription JSON with its timing, as partial results
+    growing word by word followed by the final result. Results are released once the audio fed to the backend (or,
+    without audio, the wall clock scaled by speed) reaches their end time
+    '''
+
+    def __init__(self, transcription, speed=1.0, max_result_words=20, max_pause=1.0):
+        '''
+        :param transcription: Parsed transcription JSON
+        :param speed: Replay speed without audio chunks (ex: 10 replays ten times faster than real time, None does
+                      not wait at all)
+        :param max_result_words: Most words in a single result
+        :param max_pause: A pause longer than this many seconds ends the result
+        '''
+        self.transcription = transcription
+        self.speed = speed
+        self.max_result_words = max_result_words
+        self.max_pause = max_pause
+
+    def replay_items(self):
+        '''
+        Converts the transcription items into streaming items, with the speaker of each word
+        '''
+        speakers = {}
+        if 'speaker_labels' in self.transcription['results']:
+            for segment in self.transcription['results']['speaker_labels']['segments']:
+                for item in segment['items']:
+                    speakers[item['start_time']] = segment['speaker_label']
+        last_end = 0.0
+        for item in self.transcription['results']['items']:
+            if item['type'] == 'punctuation':
+                yield {'content': item['alternatives'][0]['content'], 'type': 'punctuation', 'start_time': last_end,
+                       'end_time': last_end, 'speaker': None, 'confidence': None}
+                continue
+            last_end = float(item['end_time'])
+            yield {'content': item['alternatives'][0]['content'], 'type': 'pronunciation',
+                   'start_time': float(item['start_time']), 'end_time': last_end,
+                   'speaker': speakers.get(item['start_time']),
+                   'confidence': float(item['alternatives'][0].get('confidence', 0))}
+
+    def replay_results(self):
+        '''
+        Groups the items into results, ending a result at the end of a sentence, a speaker change or a long pause
+        '''
+        result = []
+        previous = None
+        for item in self.replay_items():
+            if item['type'] == 'pronunciation':
+                if previous is not None and (previous['speaker'] != item['speaker'] or item['start_time'] -
+                                             previous['end_time'] > self.max_pause or
+                                             len(result) >= self.max_result_words):
+                    yield result
+                    result = []
+                previous = item
+            result.append(item)
+            if item['type'] == 'punctuation' and item['content'] in '.?!' and previous is not None:
+                yield result
+                result = []
+                previous = None
+        if len(result) > 0:
+            yield result
+
+    def results(self, chunks=None):
+        clock = self.audio_clock(chunks) if chunks is not None else self.wall_clock()
+        audio_time = 0.0
+        for result_id, items in enumerate(self.replay_results()):
+            pronunciations = [index for index, item in enumerate(items) if item['type'] == 'pronunciation']
+            if len(pronunciations) == 0:
+                continue
+            for count, index in enumerate(pronunciations):
+                while audio_time < items[index]['end_time']:
+                    audio_time = next(clock, float('inf'))
+                is_partial = count < len(pronunciations) - 1
+                shown = items[:index + 1] if is_partial else items
+                yield {'result_id': str(result_id), 'is_partial': is_partial, 'start_time': shown[0]['start_time'],
+                       'end_time': items[index]['end_time'], 'items': shown}
+
+    def audio_clock(self, chunks):
+        audio_time = 0.0
+        for chunk in chunks:
+            audio_time += len(chunk) / 2.0 / SAMPLE_RATE
+            yield audio_time
+
+    def wall_clock(self):
+        started = time.monotonic()
+        while True:
+            if self.speed is None:
+                yield float('inf')
+            else:
+                time.sleep(CHUNK_SECONDS / self.speed)
+                yield (time.monotonic() - started) * self.speed
+
+
+class StreamingSession:
+    '''
+    Incrementally maintained view of a live transcription: the speaker segments, a word index of the recent words
+    and the watch word hits. Memory stays bounded during long sessions: only the last max_segments segments and the
+    words of the last index_window_seconds are kept, final results are appended to an optional log file instead
+    '''
+
+    def __init__(self, watch_words=(), index_window_seconds=3600, max_segments=200, log_file=None):
+        '''
+        :param watch_words: Watch words loaded from the configuration file
+        :param index_window_seconds: Seconds of recent speech that can be searched
+        :param max_segments: Number of recent speaker segments kept
+        :param log_file: Open file the final items are appended to, one JSON line per result
+        '''
+        self.watch_words = [(watch_word, [normalize_word(word) for word in watch_word.split()])
+                            for watch_word in watch_words]
+        self.longest_watch_word = max([len(words) for watch_word, words in self.watch_words], default=1)
+        self.index_window_seconds = index_window_seconds
+        self.segments = collections.deque(maxlen=max_segments)
+        self.log_file = log_file
+        # Words as (word, start time, speaker), words[index] is at position first_position + index. Words before
+        # window_start fell out of the window; the list is only compacted once they are half of it, so evicting a
+        # word is O(1) and the index lookups of search stay O(1)
+        self.words = []
+        self.window_start = 0
+        self.first_position = 0
+        self.postings = {}
+        self.hits = {}
+        self.partial = None
+        self.first_final_at = None
+        self.started = time.monotonic()
+
+    def add_word(self, word, start_time, speaker):
+        '''
+        Appends a word to the index, evicts the words that fell out of the window, and returns the watch words
+        ending at the new word
+        '''
+        position = self.first_position + len(self.words)
+        self.words.append((word, start_time, speaker))
+        self.postings.setdefault(word, collections.deque()).append(position)
+        while self.words[self.window_start][1] < start_time - self.index_window_seconds:
+            old_word = self.words[self.window_start][0]
+            self.postings[old_word].popleft()
+            if len(self.postings[old_word]) == 0:
+                del self.postings[old_word]
+            self.window_start += 1
+        if self.window_start > len(self.words) // 2:
+            del self.words[:self.window_start]
+            self.first_position += self.window_start
+            self.window_start = 0
+
+        found = []
+        for watch_word, watch_words in self.watch_words:
+            if len(watch_words) > len(self.words) - self.window_start:
+                continue
+            first = len(self.words) - len(watch_words)
+            if all(self.words[first + offset][0] == watch_words[offset] for offset in range(len(watch_words))):
+                hit_time = format_time(self.words[first][1])
+                self.hits.setdefault(watch_word, {}).setdefault(self.words[first][2], []).append(hit_time)
+                found.append((watch_word, self.words[first][2], hit_time))
+        return found
+
+    def add_final(self, result):
+        '''
+        Commits a final result to the segments, the word index and the watch word hits
+        :return: The watch word hits found in the result as (watch word, speaker, time)
+        '''
+        if self.first_final_at is None:
+            self.first_final_at = time.monotonic() - self.started
+        if self.log_file is not None:
+            self.log_file.write(json.dumps(result['items']) + '\n')
+            self.log_file.flush()
+
+        found = []
+        for item in result['items']:
+            if item['type'] == 'punctuation':
+                if len(self.segments) > 0:
+                    self.segments[-1][1][-1] += item['content']
+                continue
+            speaker = speaker_name(item['speaker'])
+            if len(self.segments) == 0 or self.segments[-1][0] != speaker:
+                self.segments.append([speaker, [], item['start_time'], item['end_time']])
+            self.segments[-1][1].append(item['content'])
+            self.segments[-1][3] = item['end_time']
+            found.extend(self.add_word(normalize_word(item['content']), item['start_time'], speaker))
+        return found
+
+    def process(self, results):
+        '''
+        Consumes backend results and yields an update for each: ('partial', speaker, text, start time) while a result
+        is being recognized, ('final', speaker, text, start time) once it is committed, then ('hit', watch word,
+        speaker, time) for every watch word it completed
+        '''
+        for result in results:
+            text = ' '.join(item['content'] for item in result['items'] if item['type'] == 'pronunciation')
+            speakers = [item['speaker'] for item in result['items'] if item['type'] == 'pronunciation']
+            speaker = speaker_name(speakers[0] if len(speakers) > 0 else None)
+            if result['is_partial']:
+                self.partial = (speaker, text, result['start_time'])
+                yield ('partial', speaker, text, result['start_time'])
+                continue
+            self.partial = None
+            found = self.add_final(result)
+            yield ('final', speaker, text, result['start_time'])
+            for hit in found:
+                yield ('hit',) + hit
+
+    def search(self, phrase):
+        '''
+        Finds when a word or phrase was said within the index window
+        :return: The times grouped by speaker, in the same format as get_time_from_word (ex: {'cloud': {'Speaker 1':
+                 ['00:01:05']}}), or None if it was not said
+        '''
+        query = [normalize_word(word) for word in phrase.split()]
+        if len(query) == 0:
+            return None
+        times = {}
+        for position in self.postings.get(query[0], []):
+            index = position - self.first_position
+            if index + len(query) > len(self.words):
+                continue
+            if all(self.words[index + offset][0] == query[offset] for offset in range(1, len(query))):
+                word, start_time, speaker = self.words[index]
+                times.setdefault(speaker, []).append(format_time(start_time))
+        if len(times) == 0:
+            return None
+        return {phrase.lower(): times}
+
+    def formatted_segments(self):
+        '''
+        Returns the kept segments in the format of format_transcription, list of (speaker, text, timestamp)
+        '''
+        return [(speaker + ':', ' '.join(words), format_time(start) + ' - ' + format_time(end))
+                for speaker, words, start, end in self.segments]
+
+
+def read_session_log(log_path, language_code='en-US'):
+    '''
+    Rebuilds a transcription JSON, in the AWS Transcribe batch format, from the final results logged by a session, so
+    the batch pipeline (PDFs, analytics, summary) can be run once the session ends
+    :param log_path: Log file written by StreamingSession
+    :return: The transcription JSON
+    '''
+    items = []
+    segments = []
+    words = []
+    with open(log_path) as file:
+        for line in file:
+            for item in json.loads(line):
+                if item['type'] == 'punctuation':
+                    items.append({'alternatives': [{'confidence': '0.0', 'content': item['content']}],
+                                  'type': 'punctuation'})
+                    if len(words) > 0:
+                        words[-1] += item['content']
+                    continue
+                start_time = '{:.3f}'.format(item['start_time'])
+                end_time = '{:.3f}'.format(item['end_time'])
+                label = 'spk_{}'.format(int(speaker_name(item['speaker']).split(' ')[1]) - 1)
+                items.append({'start_time': start_time, 'end_time': end_time, 'type': 'pronunciation',
+                              'alternatives': [{'confidence': str(item.get('confidence') or 0.0),
+                                                'content': item['content']}]})
+                if len(segments) == 0 or segments[-1]['speaker_label'] != label:
+                    segments.append({'start_time': start_time, 'end_time': end_time, 'speaker_label': label,
+                                     'items': []})
+                segments[-1]['items'].append({'start_time': start_time, 'end_time': end_time, 'speaker_label': label})
+                segments[-1]['end_time'] = end_time
+                words.append(item['content'])
+    return {
+        'jobName': 'streaming',
+        'results': {
+            'language_code': language_code,
+            'transcripts': [{'transcript': ' '.join(words)}],
+            'speaker_labels': {'speakers': len({segment['speaker_label'] for segment in segments}),
+                               'segments': segments},
+            'items': items
+        },
+        'status': 'COMPLETED'
+    }
+
+
+def stream_transcription(backend, chunks, session):
+    '''
+    Runs a streaming session, printing the live transcription and the watch word hits as they are recognized
+    :param backend: StreamingBackend
+    :param chunks: Audio chunks fed to the backend (ex: from audio_chunks), None for backends that replay a
+                   transcription
+    :param session: StreamingSession updated with the results
+    :return: The session
+    '''
+    for update in session.process(backend.results(chunks)):
+        if update[0] == 'partial':
+            sys.stdout.write('\r{} [{}]: {}'.format(update[1], format_time(update[3]), update[2])[:120].ljust(120))
+            sys.stdout.flush()
+        elif update[0] == 'final':
+            sys.stdout.write('\r{} [{}]: {}\n'.format(update[1], format_time(update[3]), update[2]))
+        else:
+            print('  * {} ({}, {})'.format(update[1], update[2], update[3]))
+    if session.first_final_at is not None:
+        print('First searchable text after {:.1f} seconds'.format(session.first_final_at))
+    return session
+
+
+def main():
+    '''
+    Streams a recording through AWS Transcribe streaming, or replays a transcription JSON as a live stream
+    Usage: python streaming_transcription.py transcribe MEDIA_FILE [REGION]
+           python streaming_transcription.py replay TRANSCRIPTION.json [SPEED]
+    '''
+    if len(sys.argv) < 3 or sys.argv[1] not in ('transcribe', 'replay'):
+        print(main.__doc__)
+        return
+    with open('transcription_config.json') as file:
+        watch_words = json.load(file)['WatchWords']
+    session = StreamingSession(watch_words)
+    if sys.argv[1] == 'transcribe':
+        region = sys.argv[3] if len(sys.argv) > 3 else 'us-east-1'
+        stream_transcription(TranscribeStreamingBackend(region), audio_chunks(sys.argv[2], realtime=True), session)
+    else:
+        with open(sys.argv[2]) as file:
+            transcription = json.load(file)
+        speed = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+        stream_transcription(ReplayBackend(transcription, speed), None, session)
+
+    while True:
+        phrase = input('Search the recent transcription for a word or phrase (leave empty to exit): ')
+        if phrase == '':
+            break
+        print(session.search(phrase))
+
+
+if __name__ == '__main__':
+    main()
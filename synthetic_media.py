@@ -0,0 +1,165 @@
+import json
+import random
+
+import numpy as np
+
+# Author: James (Jimmy) Allah-Mensah
+# Version: Python 3.7
+
+DEFAULT_VOCABULARY = ['the', 'we', 'our', 'team', 'project', 'data', 'analytics', 'cloud', 'cyber', 'security',
+                      'artificial', 'intelligence', 'digital', 'modernization', 'enterprise', 'business',
+                      'solutions', 'managed', 'services', 'application', 'high', 'performance', 'computing',
+                      'customer', 'mission', 'today', 'next', 'quarter', 'deliver', 'platform', 'model', 'pipeline',
+                      'meeting', 'question', 'update', 'review', 'release', 'support', 'network', 'storage', 'and',
+                      'to', 'of', 'is', 'that', 'with', 'for', 'on', 'this', 'will']
+
+SPEAKER_NAMES = ['James', 'Maria', 'David', 'Aisha', 'Chen', 'Olga', 'Kwame', 'Priya', 'Lucas', 'Fatima']
+
+
+def generate_transcription(duration, num_speakers=2, vocabulary=None, words_per_minute=150, seed=0,
+                           introduce_speakers=True, language_code='en-US'):
+    '''
+    Generates a transcription JSON in the AWS Transcribe format, including speaker labels
+    :param duration: Length of the recording in seconds (ex: 300 for 5 minutes, 36000 for 10 hours)
+    :param num_speakers: Number of speakers taking turns
+    :param vocabulary: Words the speakers choose from (defaults to DEFAULT_VOCABULARY)
+    :param words_per_minute: Average speaking rate
+    :param seed: Random seed, the same seed always generates the same transcription
+    :param introduce_speakers: Whether each speaker says "my name is ..." the first time they speak
+    :param language_code: The detected language code
+    :return: The transcription JSON
+    '''
+    generator = random.Random(seed)
+    vocabulary = vocabulary or DEFAULT_VOCABULARY
+    word_length = 60.0 / words_per_minute
+
+    items = []
+    segments = []
+    words = []
+    introduced = set()
+    current_time = 0.0
+    speaker = 0
+    while current_time < duration:
+        if num_speakers > 1 and generator.random() < 0.7:
+            speaker = (speaker + generator.randrange(1, num_speakers)) % num_speakers
+        segment_words = [generator.choice(vocabulary) for _ in range(generator.randint(4, 40))]
+        if introduce_speakers and speaker not in introduced:
+            introduced.add(speaker)
+            segment_words = ['my', 'name', 'is', SPEAKER_NAMES[speaker % len(SPEAKER_NAMES)].lower()] + segment_words
+
+        segment_start = current_time
+        segment_items = []
+        for index, word in enumerate(segment_words):
+            if current_time >= duration:
+                break
+            length = word_length * generator.uniform(0.6, 1.4)
+            start_time = '{:.3f}'.format(current_time)
+            end_time = '{:.3f}'.format(current_time + length * 0.8)
+            items.append({
+                'start_time': start_time,
+                'end_time': end_time,
+                'alternatives': [{'confidence': '{:.4f}'.format(generator.uniform(0.6, 1.0)), 'content': word}],
+                'type': 'pronunciation'
+            })
+            segment_items.append({'start_time': start_time, 'end_time': end_time,
+                                  'speaker_label': 'spk_{}'.format(speaker)})
+            words.append(word)
+            current_time += length
+            if index == len(segment_words) - 1 or generator.random() < 0.08:
+                items.append({'alternatives': [{'confidence': '0.0', 'content': '.'}], 'type': 'punctuation'})
+                words[-1] += '.'
+
+        if len(segment_items) > 0:
+            segments.append({
+                'start_time': '{:.3f}'.format(segment_start),
+                'end_time': segment_items[-1]['end_time'],
+                'speaker_label': 'spk_{}'.format(speaker),
+                'items': segment_items
+            })
+        current_time += generator.uniform(0.2, 1.5)
+
+    return {
+        'jobName': 'synthetic_{}'.format(int(duration)),
+        'accountId': '000000000000',
+        'results': {
+            'language_code': language_code,
+            'transcripts': [{'transcript': ' '.join(words)}],
+            'speaker_labels': {'speakers': num_speakers, 'segments': segments},
+            'items': items
+        },
+        'status': 'COMPLETED'
+    }
+
+
+def write_transcription(transcription, path):
+    '''
+    Writes a transcription JSON to a file
+    :return: file:// URI of the transcription, usable wherever a TranscriptFileUri is expected
+    '''
+    with open(path, 'w') as file:
+        json.dump(transcription, file)
+    return 'file://' + path
+
+
+def generate_slide_times(duration, mean_slide_length=60, seed=0):
+    '''
+    Scripts the slide changes of a presentation
+    :param duration: Length of the video in seconds
+    :param mean_slide_length: Average number of seconds each slide is shown
+    :param seed: Random seed
+    :return: Sorted list of the seconds at which a new slide is shown (the first slide at 0 is not included)
+    '''
+    generator = random.Random(seed)
+    slide_times = []
+    current_time = 0
+    while True:
+        current_time += max(1, int(generator.expovariate(1.0 / mean_slide_length)))
+        if current_time >= duration:
+            return slide_times
+        slide_times.append(current_time)
+
+
+def slide_frame(slide_index, size):
+    '''
+    Draws a slide: a solid background colour with a title bar, different for every slide
+    :param slide_index: Index of the slide
+    :param size: (width, height) of the video
+    :return: RGB frame
+    '''
+    generator = np.random.RandomState(slide_index)
+    frame = np.empty((size[1], size[0], 3), dtype=np.uint8)
+    frame[:] = generator.randint(0, 256, 3)
+    frame[:size[1] // 6] = generator.randint(0, 256, 3)
+    return frame
+
+
+def generate_slide_video(path, duration, slide_times, size=(320, 180), fps=1, keyframes_at_slides=False):
+    '''
+    Writes a video of a slide deck whose slides change at the scripted times
+    :param path: Output video path (ex: synthetic.mp4)
+    :param duration: Length of the video in seconds
+    :param slide_times: Seconds at which a new slide is shown, see generate_slide_times
+    :param size: (width, height) of the video
+    :param fps: Frames per second of the encoded video
+    :param keyframes_at_slides: Whether every slide starts with a keyframe, as screen recording encoders do
+    :return: The output video path
+    '''
+    from moviepy.editor import VideoClip
+
+    boundaries = np.asarray(slide_times)
+    frames = {}
+
+    def make_frame(t):
+        slide_index = int(np.searchsorted(boundaries, t, side='right'))
+        if slide_index not in frames:
+            frames.clear()
+            frames[slide_index] = slide_frame(slide_index, size)
+        return frames[slide_index]
+
+    clip = VideoClip(make_frame, duration=duration)
+    ffmpeg_params = None
+    if keyframes_at_slides:
+        ffmpeg_params = ['-force_key_frames', ','.join(str(slide_time) for slide_time in [0] + list(slide_times))]
+    clip.write_videofile(path, fps=fps, codec='libx264', audio=False, logger=None, ffmpeg_params=ffmpeg_params)
+    clip.close()
+    return path
@@ -0,0 +1,161 @@
+import re
+
+import numpy as np
+
+# Author: James (Jimmy) Allah-Mensah
+# Version: Python 3.7
+
+STOP_WORDS = {'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'do', 'for', 'from', 'has', 'have', 'i',
+              'if', 'in', 'is', 'it', 'its', 'me', 'my', 'of', 'on', 'or', 'so', 'that', 'the', 'their', 'them',
+              'then', 'there', 'they', 'this', 'to', 'uh', 'um', 'was', 'we', 'were', 'what', 'will', 'with', 'you',
+              'your', 'our', 'us', 'he', 'she', 'his', 'her', 'not', 'just', 'like', 'yeah', 'okay', 'can', 'all'}
+
+MIN_SENTENCE_WORDS = 5
+
+
+def split_sentences(transcribed_data):
+    '''
+    Splits the formatted transcription into sentences, keeping the speaker and timestamp of each
+    :param transcribed_data: Formatted transcription, list of (speaker, text, timestamp)
+    :return: List of (speaker, sentence, timestamp)
+    '''
+    sentences = []
+    for speaker, text, timestamp in transcribed_data:
+        for sentence in re.split(r'(?<=[.?!])\s+', text):
+            sentence = sentence.strip()
+            if len(sentence.split()) >= MIN_SENTENCE_WORDS:
+                sentences.append((speaker, sentence, timestamp))
+    return sentences
+
+
+def tokenize(sentence):
+    return [token for token in re.findall(r"[a-z0-9']+", sentence.lower()) if token not in STOP_WORDS]
+
+
+def build_term_matrix(documents):
+    '''
+    Builds a sparse (coordinate format) term count matrix of the sentences of one or many transcriptions
+    :param documents: List of sentence lists, one per transcription
+    :return: (rows, columns, counts, document of each sentence, number of sentences, vocabulary)
+    '''
+    vocabulary = {}
+    rows = []
+    columns = []
+    sentence_documents = []
+    sentence_count = 0
+    for document_index, sentences in enumerate(documents):
+        for speaker, sentence, timestamp in sentences:
+            for token in tokenize(sentence):
+                rows.append(sentence_count)
+                columns.append(vocabulary.setdefault(token, len(vocabulary)))
+            sentence_documents.append(document_index)
+            sentence_count += 1
+
+    rows = np.array(rows, dtype=np.int64)
+    columns = np.array(columns, dtype=np.int64)
+    # Collapsing repeated (sentence, term) pairs turns the token list into term counts
+    cells, counts = np.unique(rows * max(len(vocabulary), 1) + columns, return_counts=True)
+    rows = cells // max(len(vocabulary), 1)
+    columns = cells % max(len(vocabulary), 1)
+    return rows, columns, counts, np.array(sentence_documents, dtype=np.int64), sentence_count, vocabulary
+
+
+def score_sentences(documents, watch_words=(), watch_word_boost=0.0):
+    '''
+    Scores every sentence by the average TF-IDF weight of its terms. The inverse document frequency is computed per
+    transcription, treating each of its sentences as a document, so a batch of transcriptions is scored with the
+    same handful of array operations as a single one
+    :param documents: List of sentence lists, one per transcription
+    :param watch_words: Watch words loaded from the configuration file
+    :param watch_word_boost: Score multiplier added per watch word mentioned in the sentence (0 disables boosting)
+    :return: Array of sentence scores, in the order of the sentences
+    '''
+    rows, columns, counts, sentence_documents, sentence_count, vocabulary = build_term_matrix(documents)
+    if sentence_count == 0:
+        return np.zeros(0)
+    num_terms = max(len(vocabulary), 1)
+
+    # Document frequency of each term within its own transcription
+    term_documents = sentence_documents[rows] * num_terms + columns
+    unique_cells, document_frequency = np.unique(term_documents, return_counts=True)
+    frequency = document_frequency[np.searchsorted(unique_cells, term_documents)]
+    sentences_per_document = np.bincount(sentence_documents)[sentence_documents[rows]]
+    idf = np.log((1.0 + sentences_per_document) / (1.0 + frequency)) + 1.0
+
+    weights = (1.0 + np.log(counts)) * idf
+    terms_per_sentence = np.bincount(rows, minlength=sentence_count)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = np.where(terms_per_sentence > 0,
+                          np.bincount(rows, weights=weights, minlength=sentence_count) / terms_per_sentence, 0.0)
+
+    if watch_word_boost > 0 and len(watch_words) > 0:
+        all_sentences = [sentence.lower() for sentences in documents for speaker, sentence, timestamp in sentences]
+        hits = np.zeros(sentence_count)
+        for watch_word in watch_words:
+            pattern = re.compile(r'\b{}\b'.format(re.escape(watch_word.lower())))
+            hits += np.array([len(pattern.findall(sentence)) for sentence in all_sentences])
+        scores *= 1.0 + watch_word_boost * hits
+    return scores
+
+
+def select_top_sentences(sentences, scores, num_sentences):
+    '''
+    Picks the highest scoring sentences and returns them in the order they were said
+    '''
+    if num_sentences >= len(sentences):
+        return list(sentences)
+    top = np.argpartition(-scores, num_sentences - 1)[:num_sentences]
+    return [sentences[index] for index in np.sort(top)]
+
+
+def summarize_transcription(transcribed_data, num_sentences, watch_words=(), watch_word_boost=0.0):
+    '''
+    Extractive summary of a formatted transcription
+    :param transcribed_data: Formatted transcription, list of (speaker, text, timestamp)
+    :param num_sentences: Number of sentences in the summary
+    :param watch_words: Watch words loaded from the configuration file
+    :param watch_word_boost: Score multiplier added per watch word mentioned in the sentence (0 disables boosting)
+    :return: The summary sentences as (speaker, sentence, timestamp), in the order they were said
+    '''
+    if transcribed_data is None:
+        return None
+    sentences = split_sentences(transcribed_data)
+    scores = score_sentences([sentences], watch_words, watch_word_boost)
+    return select_top_sentences(sentences, scores, num_sentences)
+
+
+def summarize_batch(transcriptions, num_sentences, watch_words=(), watch_word_boost=0.0):
+    '''
+    Extractive summaries of many formatted transcriptions, scored together in one pass
+    :param transcriptions: Dictionary of job name to formatted transcription
+    :return: Dictionary of job name to summary sentences
+    '''
+    job_names = list(transcriptions)
+    documents = [split_sentences(transcriptions[job_name]) for job_name in job_names]
+    scores = score_sentences(documents, watch_words, watch_word_boost)
+    summaries = {}
+    offset = 0
+    for job_name, sentences in zip(job_names, documents):
+        summaries[job_name] = select_top_sentences(sentences, scores[offset:offset + len(sentences)], num_sentences)
+        offset += len(sentences)
+    return summaries
+
+
+def add_summary_page(pdf, summary, speaker_dict):
+    '''
+    Adds the summary page to the transcription PDF
+    :param pdf: FPDF document
+    :param summary: Summary sentences returned by summarize_transcription
+    :param speaker_dict: Identified or defaulted speaker names
+    '''
+    pdf.add_page()
+    pdf.set_font("Arial", size=20)
+    pdf.cell(200, 10, txt='Summary', ln=1, align='C')
+    pdf.cell(200, 10, txt='', ln=1, align='L')
+    for speaker, sentence, timestamp in summary:
+        speaker_name = speaker_dict.get(speaker.replace(":", ""), speaker.replace(":", ""))
+        pdf.set_font("Helvetica", 'B', size=12)
+        pdf.cell(200, 8, txt=speaker_name + " [" + timestamp + "]:", ln=1, align='L')
+        pdf.set_font("Helvetica", size=12)
+        pdf.multi_cell(190, 6, txt=sentence.encode('latin-1', 'replace').decode('latin-1'), align='L')
+        pdf.cell(200, 4, txt='', ln=1, align='L')
@@ -0,0 +1,224 @@
+import collections
+import heapq
+import sys
+
+from transcript_summary import STOP_WORDS
+
+# Author: James (Jimmy) Allah-Mensah
+# Version: Python 3.7
+
+MAX_PHRASE_WORDS = 3
+MIN_PHRASE_COUNT = 2
+TOP_COMPLETIONS = 10
+
+
+class TrieNode:
+    '''
+    Node of the compressed trie. count and speakers cover every term below the node, term_count and term_speakers
+    the term ending at it, and top holds the node's highest count completions, so completing a prefix never walks
+    the subtree
+    '''
+    __slots__ = ('children', 'count', 'speakers', 'term', 'term_count', 'term_speakers', 'top')
+
+    def __init__(self):
+        # First character of the edge label: (edge label, child node)
+        self.children = {}
+        self.count = 0
+        self.speakers = collections.Counter()
+        self.term = None
+        self.term_count = 0
+        self.term_speakers = collections.Counter()
+        self.top = []
+
+
+def common_prefix_length(a, b):
+    length = 0
+    for char_a, char_b in zip(a, b):
+        if char_a != char_b:
+            break
+        length += 1
+    return length
+
+
+class TranscriptTrie:
+    '''
+    Compressed prefix trie (radix tree) over the words and frequent phrases of a transcription, with the number of
+    times, overall and per speaker, each was said. Completing a prefix or looking up a term walks one edge per
+    shared prefix, O(prefix length), however long the transcription is
+    '''
+
+    def __init__(self, transcription, max_phrase_words=MAX_PHRASE_WORDS, min_phrase_count=MIN_PHRASE_COUNT,
+                 top_completions=TOP_COMPLETIONS):
+        '''
+        :param transcription: Parsed transcription JSON
+        :param max_phrase_words: Longest phrase (n-gram) added to the trie
+        :param min_phrase_count: Phrases said fewer times than this are left out
+        :param top_completions: Number of completions kept at every node
+        '''
+        self.root = TrieNode()
+        self.top_completions = top_completions
+        words, speakers = load_words(transcription)
+
+        counts = collections.Counter()
+        speaker_counts = collections.defaultdict(collections.Counter)
+        for length in range(1, max_phrase_words + 1):
+            for start in range(len(words) - length + 1):
+                gram = words[start:start + length]
+                if '' in gram or (length > 1 and (gram[0] in STOP_WORDS or gram[-1] in STOP_WORDS)):
+                    continue
+                term = ' '.join(gram)
+                counts[term] += 1
+                speaker_counts[term][speakers[start]] += 1
+
+        for term, count in counts.items():
+            if ' ' in term and count < min_phrase_count:
+                continue
+            self.insert(term, count, speaker_counts[term])
+        self.compute_top(self.root)
+
+    def insert(self, term, count, speakers):
+        node = self.root
+        node.count += count
+        node.speakers.update(speakers)
+        rest = term
+        while len(rest) > 0:
+            edge = node.children.get(rest[0])
+            if edge is None:
+                child = TrieNode()
+                node.children[rest[0]] = (rest, child)
+                node = child
+                rest = ''
+            else:
+                label, child = edge
+                shared = common_prefix_length(label, rest)
+                if shared < len(label):
+                    # Split the edge where the term leaves it
+                    middle = TrieNode()
+                    middle.children[label[shared]] = (label[shared:], child)
+                    middle.count = child.count
+                    middle.speakers = collections.Counter(child.speakers)
+                    node.children[rest[0]] = (label[:shared], middle)
+                    child = middle
+                node = child
+                rest = rest[shared:]
+            node.count += count
+            node.speakers.update(speakers)
+        node.term = term
+        node.term_count = count
+        node.term_speakers = collections.Counter(speakers)
+
+    def compute_top(self, node):
+        '''
+        Fills in the top completions of every node, bottom up, from the top completions of its children
+        '''
+        candidates = []
+        if node.term is not None:
+            candidates.append((node.term_count, node.term))
+        for label, child in node.children.values():
+            self.compute_top(child)
+            candidates.extend((count, term) for term, count in child.top)
+        node.top = [(term, count) for count, term in
+                    heapq.nlargest(self.top_completions, candidates, key=lambda candidate: (candidate[0],
+                                                                                            -len(candidate[1])))]
+
+    def find_node(self, prefix):
+        '''
+        Returns the node below which every term starts with the prefix, None if no term does
+        '''
+        node = self.root
+        rest = prefix
+        while len(rest) > 0:
+            edge = node.children.get(rest[0])
+            if edge is None:
+                return None
+            label, child = edge
+            shared = common_prefix_length(label, rest)
+            if shared == len(rest):
+                return child
+            if shared < len(label):
+                return None
+            node = child
+            rest = rest[shared:]
+        return node
+
+    def complete(self, prefix, limit=None):
+        '''
+        Returns the most said words and phrases starting with the prefix
+        :return: List of (term, count), highest count first
+        '''
+        node = self.find_node(prefix.lower())
+        if node is None:
+            return []
+        return node.top[:limit]
+
+    def lookup(self, term):
+        '''
+        Returns how many times a word or phrase was said, overall and per speaker label, (0, {}) if it was not
+        '''
+        node = self.find_node(term.lower())
+        if node is None or node.term != term.lower():
+            return 0, {}
+        return node.term_count, dict(node.term_speakers)
+
+    def top_phrases(self, limit=TOP_COMPLETIONS, min_words=2, speaker=None):
+        '''
+        Frequency table of the most said phrases
+        :param min_words: Fewest words in a phrase (1 includes single words)
+        :param speaker: Only count what this speaker label said (ex: spk_0)
+        :return: List of (phrase, count), highest count first
+        '''
+        phrases = []
+        stack = [self.root]
+        while len(stack) > 0:
+            node = stack.pop()
+            if node.term is not None and node.term.count(' ') + 1 >= min_words:
+                count = node.term_count if speaker is None else node.term_speakers.get(speaker, 0)
+                if count > 0:
+                    phrases.append((count, node.term))
+            stack.extend(child for label, child in node.children.values())
+        return [(term, count) for count, term in heapq.nlargest(limit, phrases)]
+
+
+def load_words(transcription):
+    '''
+    Loads the lowercased words of the transcription and the speaker label of each, compared the way
+    get_time_from_word compares them. Every punctuation mark is kept as an empty word, since the search does not match
+    a phrase across one, so every suggested phrase can be found
+    '''
+    words = []
+    speakers = []
+    labels = []
+    if 'speaker_labels' in transcription['results']:
+        for segment in transcription['results']['speaker_labels']['segments']:
+            labels.extend([segment['speaker_label']] * len(segment['items']))
+    position = 0
+    for item in transcription['results']['items']:
+        content = item['alternatives'][0]['content']
+        if item['type'] == 'punctuation':
+            words.append('')
+            speakers.append(None)
+            continue
+        words.append(content.lower())
+        speakers.append(labels[position] if position < len(labels) else None)
+        position += 1
+    return words, speakers
+
+
+def main():
+    '''
+    Prints the most said phrases of a transcription, or the completions of a prefix
+    Usage: python transcript_trie.py TRANSCRIPTION.json [PREFIX]
+    '''
+    import json
+    if len(sys.argv) < 2:
+        print(main.__doc__)
+        return
+    with open(sys.argv[1]) as file:
+        trie = TranscriptTrie(json.load(file))
+    results = trie.complete(sys.argv[2]) if len(sys.argv) > 2 else trie.top_phrases()
+    for term, count in results:
+        print('{}: {}'.format(term, count))
+
+
+if __name__ == '__main__':
+    main()
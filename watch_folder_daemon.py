@@ -0,0 +1,402 @@
+import ctypes
+import ctypes.util
+import hashlib
+import logging
+import os
+import re
+import select
+import shutil
+import signal
+import sqlite3
+import threading
+import time
+
+# Author: James (Jimmy) Allah-Mensah
+# Version: Python 3.7
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+
+class InotifyWaiter:
+    '''
+    Wakes the watcher as soon as something changes in a watched directory, using Linux inotify through libc
+    '''
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.watched = set()
+
+    def add_directory(self, directory):
+        if directory in self.watched:
+            return
+        if self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK) < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_add_watch failed for {}'.format(directory))
+        self.watched.add(directory)
+
+    def wait(self, timeout):
+        '''
+        Waits until a watched directory changes or the timeout passes
+        :return: True if something changed
+        '''
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if len(readable) == 0:
+            return False
+        # Only the wake up matters, the directories are scanned again to see what changed
+        while True:
+            try:
+                if len(os.read(self.fd, 65536)) == 0:
+                    break
+            except BlockingIOError:
+                break
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWaiter:
+    '''
+    Fallback for systems without inotify: the directories are simply scanned every poll interval
+    '''
+
+    def add_directory(self, directory):
+        pass
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+        return False
+
+    def close(self):
+        pass
+
+
+def create_waiter():
+    try:
+        return InotifyWaiter()
+    except (OSError, AttributeError, TypeError):
+        # No inotify (ex: macOS, Windows), libc has no inotify_init1 or cannot be found
+        logging.info('inotify is not available, polling the watched directories instead')
+        return PollingWaiter()
+
+
+class JobQueue:
+    '''
+    Durable job queue kept in SQLite. Every media file is enqueued once per version (path, size and modification
+    time), and a job is only marked done after its outputs are written, so a restart neither loses nor repeats work:
+    jobs left running by a stopped daemon are queued again, and their transcription job is picked up by name
+    '''
+
+    def __init__(self, path):
+        '''
+        :param path: SQLite database file
+        '''
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self.connect()
+        with connection:
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    job_name TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt REAL NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    outputs TEXT,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    UNIQUE (path, size, mtime))''')
+        connection.close()
+
+    def connect(self):
+        # Every thread uses its own connection, SQLite serializes the writers
+        connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        return connection
+
+    def enqueue(self, path, size, mtime, job_name):
+        '''
+        Adds a media file to the queue, unless this version of it was already enqueued
+        :return: True if the file was added
+        '''
+        connection = self.connect()
+        now = time.time()
+        cursor = connection.execute('INSERT OR IGNORE INTO jobs (path, size, mtime, job_name, created, updated) '
+                                    'VALUES (?, ?, ?, ?, ?, ?)', (path, size, mtime, job_name, now, now))
+        connection.close()
+        return cursor.rowcount > 0
+
+    def is_known(self, path, size, mtime):
+        connection = self.connect()
+        row = connection.execute('SELECT 1 FROM jobs WHERE path = ? AND size = ? AND mtime = ?',
+                                 (path, size, mtime)).fetchone()
+        connection.close()
+        return row is not None
+
+    def claim(self, connection):
+        '''
+        Marks the oldest job that is due as running
+        :return: (id, path, job_name, attempts) of the job, None if no job is due
+        '''
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute("SELECT id, path, job_name, attempts FROM jobs WHERE status = 'queued' AND "
+                                     "next_attempt <= ? ORDER BY id LIMIT 1", (time.time(),)).fetchone()
+            if row is not None:
+                connection.execute("UPDATE jobs SET status = 'running', updated = ? WHERE id = ?",
+                                   (time.time(), row[0]))
+            connection.execute('COMMIT')
+        except sqlite3.Error:
+            connection.execute('ROLLBACK')
+            raise
+        return row
+
+    def complete(self, connection, job_id, outputs):
+        connection.execute("UPDATE jobs SET status = 'done', outputs = ?, last_error = NULL, updated = ? "
+                           "WHERE id = ?", ('\n'.join(outputs), time.time(), job_id))
+
+    def fail(self, connection, job_id, attempts, error, max_attempts, retry_seconds):
+        '''
+        Records a failed attempt, queueing the job again with an exponential backoff until max_attempts is reached
+        '''
+        attempts += 1
+        status = 'failed' if attempts >= max_attempts else 'queued'
+        connection.execute('UPDATE jobs SET status = ?, attempts = ?, next_attempt = ?, last_error = ?, updated = ? '
+                           'WHERE id = ?', (status, attempts, time.time() + retry_seconds * 2 ** (attempts - 1),
+                                            error, time.time(), job_id))
+        return status
+
+    def requeue_interrupted(self):
+        '''
+        Queues again the jobs that were running when the daemon stopped
+        :return: Number of jobs queued again
+        '''
+        connection = self.connect()
+        cursor = connection.execute("UPDATE jobs SET status = 'queued', updated = ? WHERE status = 'running'",
+                                    (time.time(),))
+        connection.close()
+        return cursor.rowcount
+
+    def counts(self):
+        connection = self.connect()
+        counts = dict(connection.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+        connection.close()
+        return counts
+
+
+def make_job_name(path, size, mtime):
+    '''
+    Derives a transcription job name from the file, the same file version always gets the same name
+    (ex: /in/Weekly Sync.mp4 -> Weekly_Sync_3f2a9c1b7d04)
+    '''
+    stem = re.sub(r'[^0-9a-zA-Z._-]+', '_', os.path.splitext(os.path.basename(path))[0]).strip('_')[:150]
+    digest = hashlib.sha1('{}|{}|{}'.format(os.path.abspath(path), size, mtime).encode()).hexdigest()[:12]
+    return '{}_{}'.format(stem or 'recording', digest)
+
+
+class WatchFolderDaemon:
+    '''
+    Watches directories for new media files, waits until each one is completely written, enqueues it in the durable
+    job queue, and runs the whole transcription of the queued files with a pool of worker threads, moving the
+    outputs to a destination tree that mirrors the watched directories
+    '''
+
+    def __init__(self, directories, destination, queue_path, media_formats, s3_bucket_name, workers=2,
+                 settle_seconds=10, poll_seconds=5, max_attempts=5, retry_seconds=60, excluded=()):
+        '''
+        :param directories: Directories watched, with their subdirectories
+        :param destination: Directory the outputs are moved to, in a folder per media file
+        :param queue_path: SQLite database of the job queue
+        :param media_formats: File extensions picked up (ex: ['mp3', 'mp4'])
+        :param s3_bucket_name: Name of S3 Bucket files are uploaded to
+        :param workers: Number of files transcribed at the same time
+        :param settle_seconds: A file is complete once its size and modification time stop changing for this long
+        :param poll_seconds: Seconds between scans when nothing wakes the watcher
+        :param max_attempts: Attempts before a job is marked failed
+        :param retry_seconds: Wait before the first retry, doubled after every failed attempt
+        :param excluded: Directories never scanned (ex: the pipeline cache)
+        '''
+        self.directories = [os.path.abspath(directory) for directory in directories]
+        self.destination = os.path.abspath(destination)
+        self.queue = JobQueue(queue_path)
+        self.media_formats = {media_format.lower() for media_format in media_formats}
+        self.s3_bucket_name = s3_bucket_name
+        self.workers = workers
+        self.settle_seconds = settle_seconds
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.excluded = {os.path.abspath(directory) for directory in excluded} | {self.destination}
+        self.stopping = threading.Event()
+        self.work_available = threading.Event()
+        # Files seen but not yet complete: path -> (size, modification time, time they were first seen unchanged)
+        self.pending = {}
+        # (path, size, modification time) of the files already in the queue
+        self.known = set()
+
+    def scan(self, waiter):
+        '''
+        Lists the media files of the watched directories, watching any new subdirectory
+        :return: Dictionary of path to (size, modification time)
+        '''
+        found = {}
+        for directory in self.directories:
+            for root, subdirectories, files in os.walk(directory):
+                subdirectories[:] = [subdirectory for subdirectory in subdirectories
+                                     if not subdirectory.startswith('.') and
+                                     os.path.join(root, subdirectory) not in self.excluded]
+                waiter.add_directory(root)
+                for file in files:
+                    if os.path.splitext(file)[1][1:].lower() not in self.media_formats or file.startswith('.'):
+                        continue
+                    path = os.path.join(root, file)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    found[path] = (stat.st_size, stat.st_mtime)
+        return found
+
+    def enqueue_complete_files(self, found):
+        '''
+        Enqueues the files whose size and modification time did not change for settle_seconds
+        '''
+        now = time.time()
+        for path in list(self.pending):
+            if path not in found:
+                del self.pending[path]
+        for path, (size, mtime) in found.items():
+            if path in self.pending and self.pending[path][:2] == (size, mtime):
+                if now - self.pending[path][2] >= self.settle_seconds and size > 0:
+                    del self.pending[path]
+                    self.known.add((path, size, mtime))
+                    if self.queue.enqueue(path, size, mtime, make_job_name(path, size, mtime)):
+                        print('Queued {}'.format(path))
+                        self.work_available.set()
+            elif (path, size, mtime) in self.known:
+                continue
+            elif self.queue.is_known(path, size, mtime):
+                self.known.add((path, size, mtime))
+            else:
+                self.pending[path] = (size, mtime, now)
+
+    def watch(self):
+        waiter = create_waiter()
+        try:
+            while not self.stopping.is_set():
+                self.enqueue_complete_files(self.scan(waiter))
+                # While files are settling, check again once they may have settled
+                timeout = self.poll_seconds if len(self.pending) == 0 else min(self.poll_seconds,
+                                                                                 self.settle_seconds)
+                waiter.wait(timeout)
+        finally:
+            waiter.close()
+
+    def output_directory(self, path):
+        '''
+        Returns the destination folder of a media file: its path relative to the watched directory, under the
+        destination (ex: /in/team/Weekly Sync.mp4 -> /out/team/Weekly Sync)
+        '''
+        for directory in self.directories:
+            if os.path.commonpath([directory, path]) == directory:
+                relative = os.path.relpath(os.path.splitext(path)[0], directory)
+                return os.path.join(self.destination, relative)
+        return os.path.join(self.destination, os.path.splitext(os.path.basename(path))[0])
+
+    def work(self, transcribe):
+        '''
+        Runs queued jobs until the daemon stops
+        :param transcribe: Function transcribing a file, given the file, job name and S3 bucket, and returning the
+                           output files (ex: audio_transcriber.transcribe_unattended)
+        '''
+        connection = self.queue.connect()
+        while not self.stopping.is_set():
+            job = self.queue.claim(connection)
+            if job is None:
+                self.work_available.wait(self.poll_seconds)
+                self.work_available.clear()
+                continue
+            job_id, path, job_name, attempts = job
+            print('Transcribing {} as {} (attempt {})'.format(path, job_name, attempts + 1))
+            try:
+                outputs = transcribe(path, job_name, self.s3_bucket_name)
+                output_dir = self.output_directory(path)
+                os.makedirs(output_dir, exist_ok=True)
+                moved = []
+                for output in outputs:
+                    moved.append(shutil.move(output, os.path.join(output_dir, os.path.basename(output))))
+                self.queue.complete(connection, job_id, moved)
+                print('Finished {}, outputs in {}'.format(path, output_dir))
+            except Exception as e:
+                logging.exception('Transcribing {} failed'.format(path))
+                status = self.queue.fail(connection, job_id, attempts, repr(e), self.max_attempts,
+                                         self.retry_seconds)
+                print('{} failed ({}), job {}'.format(path, e, status))
+        connection.close()
+
+    def run(self, transcribe):
+        '''
+        Watches the directories and runs the workers until stop is called (ex: on SIGINT or SIGTERM)
+        '''
+        requeued = self.queue.requeue_interrupted()
+        if requeued > 0:
+            print('Queued {} interrupted job(s) again'.format(requeued))
+        print('Watching {} for {} files, outputs go to {}'.format(', '.join(self.directories),
+                                                                  ', '.join(sorted(self.media_formats)),
+                                                                  self.destination))
+        workers = [threading.Thread(target=self.work, args=(transcribe,), name='worker-{}'.format(index + 1))
+                   for index in range(self.workers)]
+        for worker in workers:
+            worker.start()
+        try:
+            self.watch()
+        finally:
+            self.stopping.set()
+            self.work_available.set()
+            for worker in workers:
+                worker.join()
+        print('Stopped. Jobs: {}'.format(self.queue.counts()))
+
+    def stop(self, *args):
+        print('Stopping once the running jobs finish...')
+        self.stopping.set()
+        self.work_available.set()
+
+
+def main():
+    '''
+    Runs the watch folder daemon with the Watch settings of the configuration file
+    Usage: python watch_folder_daemon.py
+    '''
+    import audio_transcriber
+    from audio_transcriber import getConfiguration
+
+    # The configuration file and pipeline cache are relative to the script directory
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(threadName)s %(levelname)s %(message)s')
+    daemon = WatchFolderDaemon(getConfiguration('WatchDirectories'), getConfiguration('WatchDestinationDirectory'),
+                               getConfiguration('WatchQueuePath'), getConfiguration('MediaFormats'),
+                               audio_transcriber.get_s3_bucket(None), getConfiguration('WatchWorkers'),
+                               getConfiguration('WatchSettleSeconds'), getConfiguration('WatchPollSeconds'),
+                               getConfiguration('WatchMaxAttempts'), getConfiguration('WatchRetrySeconds'),
+                               excluded=[getConfiguration('PipelineCacheDirectory')])
+    signal.signal(signal.SIGINT, daemon.stop)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    daemon.run(audio_transcriber.transcribe_unattended)
+
+
+if __name__ == '__main__':
+    main()